@@ -4,9 +4,29 @@ Easy startup script for the fact-checking API
 """
 
 import os
+import runpy
 import sys
 from pathlib import Path
 
+# Must match the default in src/api.py
+DEFAULT_PORT = "8877"
+
+
+def activate_virtual_environment(venv_path: Path):
+    """Make the virtual environment's packages and scripts visible to this interpreter"""
+    if os.name == 'nt':  # Windows
+        venv_bin = venv_path / "Scripts"
+        site_packages = [venv_path / "Lib" / "site-packages"]
+    else:  # Unix/Linux/Mac
+        venv_bin = venv_path / "bin"
+        site_packages = list(venv_path.glob("lib/python*/site-packages"))
+    
+    for path in site_packages:
+        sys.path.insert(0, str(path))
+    
+    os.environ["PATH"] = str(venv_bin) + os.pathsep + os.environ.get("PATH", "")
+    os.environ["VIRTUAL_ENV"] = str(venv_path.resolve())
+
 def main():
     """Run the API server with proper environment setup"""
     
@@ -27,26 +47,24 @@ def main():
     if not db_path.exists():
         print("WARNING: No database found. Please upload documents through the API or use the document upload feature.")
     
-    print("Starting Fact-Checking API Server...")
+    # Resolve the port once; api.py reads it from the same environment
+    port = os.environ.setdefault("PORT", DEFAULT_PORT)
+    
+    print(f"Starting Fact-Checking API Server on port {port}...")
     print("Available endpoints:")
     print("  - GET  /health      - Health check")
     print("  - GET  /stats       - Database statistics")  
     print("  - POST /fact-check  - Fact-check text")
     print("  - POST /query       - General query")
     print("")
-    print("TIP: Use PORT environment variable to change port (default: 8080)")
+    print(f"TIP: Use PORT environment variable to change port (default: {DEFAULT_PORT})")
     print("TIP: Example: PORT=5001 python run_api.py")
     print("")
     
-    # Set default port if not specified
-    port = os.environ.get('PORT', '8080')
-    os.environ['PORT'] = port
-    
-    # Run the API server
-    try:
-        os.system("source venv/bin/activate && python src/api.py")
-    except KeyboardInterrupt:
-        print("\nAPI server stopped")
+    # Run the API server in this process instead of spawning a shell and a second interpreter
+    activate_virtual_environment(venv_path)
+    sys.path.insert(0, str(Path("src").resolve()))
+    runpy.run_path("src/api.py", run_name="__main__")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,70 +4,322 @@ Flask API server for fact-checking database
 Provides endpoints for browser extension integration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request
 from flask_cors import CORS
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+import codecs
+import hashlib
+import io
 import logging
 import os
+import signal
+import sys
+import threading
+import time
+import uuid
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from pydantic import BaseModel, TypeAdapter
+import orjson
 
-from database import FactCheckDatabase
-from llm_service import LLMService
+from job_store import JobStore
 from models import APIFactCheckResponse, APIQueryResponse, ContextChunk
-from document_processor import DocumentProcessor
+
+if TYPE_CHECKING:
+    from llm_service import LLMService
 
 # Load environment variables
 load_dotenv()
 
+# Backend OpenAI key, resolved once at startup (restart the server to pick up a changed key)
+_BACKEND_API_KEY = os.getenv('OPENAI_API_KEY')
+
+class InMemoryUploadRequest(Request):
+    """Request that buffers uploaded files in memory instead of spooling them to a temp file"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Uploads are capped by MAX_CONTENT_LENGTH and read fully into memory for processing anyway;
+        # Werkzeug's default spools anything over 500 KB to disk and the handler then reads it back
+        return io.BytesIO()
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 CORS(app)  # Enable CORS for browser extension
 
 # Configure file upload
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '..', 'documents')
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx', 'csv'}
+app.config['UPLOAD_FSYNC'] = os.environ.get('UPLOAD_FSYNC', 'False').lower() == 'true'
+ALLOWED_EXTENSIONS = frozenset({'txt', 'pdf', 'docx', 'csv'})
+TEXT_EXTENSIONS = frozenset({'txt', 'csv'})
+# Leading bytes of binary upload types; text uploads are recognized by decoding as UTF-8
+MAGIC_SIGNATURES = ((b'%PDF', 'pdf'), (b'PK\x03\x04', 'docx'))
 
 # Configure logging
+# In production, log to stdout only and leave collection to the container runtime;
+# synchronous file writes on every request serialize request threads
+log_handlers = [logging.StreamHandler()]
+if os.environ.get('DEBUG', 'False').lower() == 'true':
+    log_handlers.append(logging.FileHandler('logs/api.log'))
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/api.log'),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger(__name__)
 
-# Initialize database
-try:
-    db = FactCheckDatabase()
-    logger.info("Database initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize database: {e}")
-    db = None
+# Response timestamps only need ~1 second resolution, so the formatted string is reused for 0.5 s
+_TIMESTAMP_REFRESH = 0.5
+_ts_cache = {"at": float("-inf"), "iso": ""}
 
-# Initialize document processor for query embeddings
-try:
-    api_key = os.getenv('OPENAI_API_KEY')
-    if api_key:
-        doc_processor = DocumentProcessor(api_key=api_key)
-        logger.info("Document processor initialized for query embeddings")
-    else:
-        doc_processor = None
-        logger.warning("WARNING: OpenAI API key not found - query embeddings will not work")
-except Exception as e:
-    logger.error(f"Failed to initialize document processor: {e}")
-    doc_processor = None
+def _now_iso() -> str:
+    """Current time as an ISO 8601 string, refreshed at most every _TIMESTAMP_REFRESH seconds"""
+    now = time.monotonic()
+    if now - _ts_cache["at"] > _TIMESTAMP_REFRESH:
+        _ts_cache["iso"] = datetime.now().isoformat()
+        _ts_cache["at"] = now
+    return _ts_cache["iso"]
+
+def json_response(data) -> Response:
+    """Serialize a dict directly to a JSON response with orjson, which writes UTF-8 bytes directly"""
+    return Response(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), mimetype='application/json')
+
+# Pre-built serializers for the response models: pydantic-core dumps straight to JSON bytes,
+# and unset optional fields (None) are left out of the payload
+_fact_check_adapter = TypeAdapter(APIFactCheckResponse)
+_query_adapter = TypeAdapter(APIQueryResponse)
+
+def model_response(adapter: TypeAdapter, model: BaseModel) -> Response:
+    """Serialize a Pydantic response model with its pre-built adapter, omitting None fields"""
+    return Response(adapter.dump_json(model, exclude_none=True), mimetype='application/json')
+
+# Heavy services (ChromaDB, OpenAI clients) are imported and constructed on first use,
+# so importing this module, /api/health and tooling don't pay their startup cost
+db = None
+doc_processor = None
+embedding_batcher = None
+query_batcher = None
+_services_lock = threading.RLock()
+
+def _get_db():
+    """Return the shared database, initializing it on first use (None if unavailable)"""
+    global db
+    if db is None:
+        with _services_lock:
+            if db is None:
+                try:
+                    from database import FactCheckDatabase
+                    chroma_host = os.environ.get('CHROMA_HOST')
+                    if chroma_host:
+                        db = FactCheckDatabase(mode="http", host=chroma_host, port=int(os.environ.get('CHROMA_PORT', 8000)))
+                    else:
+                        db = FactCheckDatabase()
+                    logger.info("Database initialized successfully")
+                except Exception as e:
+                    logger.error("Failed to initialize database: %s", e)
+    return db
+
+def _get_doc_processor():
+    """Return the shared document processor for query embeddings (None if unavailable)"""
+    global doc_processor
+    if doc_processor is None:
+        with _services_lock:
+            if doc_processor is None:
+                try:
+                    if _BACKEND_API_KEY:
+                        from database import DEFAULT_EMBEDDING_DIM
+                        from document_processor import DocumentProcessor
+                        # Query embeddings must match the size of the vectors already stored
+                        database = _get_db()
+                        embedding_dim = database.embedding_dim if database else DEFAULT_EMBEDDING_DIM
+                        # Query embeddings are memoized by _embed_cached; the SQLite cache would commit every
+                        # miss on the request path and grow without bound
+                        doc_processor = DocumentProcessor(api_key=_BACKEND_API_KEY, embedding_dim=embedding_dim, cache_path=None)
+                        logger.info("Document processor initialized for query embeddings")
+                    else:
+                        logger.warning("WARNING: OpenAI API key not found - query embeddings will not work")
+                except Exception as e:
+                    logger.error("Failed to initialize document processor: %s", e)
+    return doc_processor
+
+def _get_query_batcher():
+    """Return the shared batcher that coalesces concurrent similarity searches into one ChromaDB query"""
+    global query_batcher
+    if query_batcher is None:
+        with _services_lock:
+            if query_batcher is None:
+                db = _get_db()
+                if db:
+                    from batching import QueryBatcher
+                    query_batcher = QueryBatcher(db.query_similar_batch)
+    return query_batcher
+
+def _get_embedding_batcher():
+    """Return the shared batcher that coalesces query embeddings into shared OpenAI calls"""
+    global embedding_batcher
+    if embedding_batcher is None:
+        with _services_lock:
+            if embedding_batcher is None:
+                processor = _get_doc_processor()
+                if processor:
+                    from batching import EmbeddingBatcher
+                    embedding_batcher = EmbeddingBatcher(processor.generate_embeddings)
+    return embedding_batcher
+
+@lru_cache(maxsize=4096)
+def _embed_cached(text_hash: str, text: str) -> tuple:
+    """Embed normalized query text; repeated queries are served from memory"""
+    return tuple(_get_embedding_batcher().embed(text))
+
+def embed_query(text: str) -> list:
+    """
+    Generate the embedding for a query, reusing cached vectors for repeated text
+    
+    Args:
+        text: Query text (normalized by case and surrounding whitespace before lookup)
+        
+    Returns:
+        Embedding vector for the query
+    """
+    normalized = text.strip().lower()
+    text_hash = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+    return list(_embed_cached(text_hash, normalized))
+
+# Uploaded files are chunked, embedded and stored in the background;
+# clients poll /api/jobs/<job_id> for the outcome. Job state lives in SQLite so any
+# worker process can answer the poll
+upload_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")
+jobs = JobStore()
+
+# Embedding batches of an upload are generated concurrently while finished batches are queued
+# for the database's writer thread
+EMBEDDING_BATCH_SIZE = 100
+embedding_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embed")
+
+def _update_job(job_id: str, **fields):
+    """Update the recorded state of an upload job"""
+    jobs.update(job_id, updated_at=_now_iso(), **fields)
 
-# LLM service will be initialized per-request when API key is provided
-# This allows clients (browser extension) to provide their own API keys
+def _write_upload(file_path: Path, data: bytes):
+    """Persist uploaded bytes, fsyncing only when UPLOAD_FSYNC durability is enabled"""
+    if not app.config['UPLOAD_FSYNC']:
+        file_path.write_bytes(data)
+        return
+    
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
-def create_llm_service(client_api_key: str = None) -> LLMService:
+def _embed_and_store(processor, db, chunks: list, metadata_list: list, ids: list):
     """
-    Create LLM service instance with client-provided API key or environment variable
+    Generate embeddings for chunk batches in parallel and queue each finished batch for the database
+    
+    Args:
+        processor: Document processor used to generate embeddings
+        db: Database to add the chunks to
+        chunks: Text chunks to embed
+        metadata_list: Metadata for each chunk
+        ids: Unique ID for each chunk
+    """
+    futures = {
+        embedding_executor.submit(processor.generate_embeddings, chunks[start:start + EMBEDDING_BATCH_SIZE]): start
+        for start in range(0, len(chunks), EMBEDDING_BATCH_SIZE)
+    }
+    
+    writes = []
+    try:
+        for future in as_completed(futures):
+            start = futures[future]
+            end = start + EMBEDDING_BATCH_SIZE
+            embeddings = future.result()
+            writes.append(db.add_document_chunks(chunks[start:end], metadata_list[start:end], ids[start:end], embeddings))
+    finally:
+        # Don't keep embedding the rest of a document that already failed
+        for future in futures:
+            future.cancel()
+    
+    # The upload only counts as stored once every batch has been written
+    for write in writes:
+        write.result()
+
+def _process_upload_job(job_id: str, file_path: Path, data: bytes, source_url: str):
+    """
+    Process an uploaded file into the database, recording progress in the jobs table
+    
+    The file is parsed straight from memory and only written to disk once text extraction succeeds.
+    
+    Args:
+        job_id: ID of the job tracking this upload
+        file_path: Destination path for the upload
+        data: Uploaded file contents
+        source_url: Source URL for the document (stored in metadata)
+    """
+    filename = file_path.name
+    db = None
+    file_written = False
+    _update_job(job_id, status="running")
+    
+    try:
+        # Reuse the shared document processor (and its OpenAI connection pool)
+        if not _BACKEND_API_KEY:
+            raise ValueError("OpenAI API key not configured")
+        
+        processor = _get_doc_processor()
+        if not processor:
+            raise RuntimeError("Document processor not initialized")
+        
+        # Process the file with source URL
+        logger.info("Processing uploaded file: %s", filename)
+        chunks, metadata_list, ids = processor.process_bytes(data, str(file_path), source_url)
+        
+        if not chunks:
+            raise ValueError("No content extracted from file")
+        
+        _write_upload(file_path, data)
+        file_written = True
+        
+        # Generate embeddings and add to database
+        db = _get_db()
+        if not db:
+            raise RuntimeError("Database not initialized")
+        _embed_and_store(processor, db, chunks, metadata_list, ids)
+        
+        logger.info("File uploaded and processed successfully: %s (%s chunks)", filename, len(chunks))
+        _update_job(job_id, status="done", processed=True, chunks_created=len(chunks))
+        
+    except Exception as processing_error:
+        logger.error("Processing failed for %s: %s", filename, processing_error)
+        # Roll back partially stored batches and the saved file so the upload can be retried
+        try:
+            if db:
+                db.delete_document_by_filename(filename)
+            if file_written:
+                file_path.unlink(missing_ok=True)
+        except Exception as cleanup_error:
+            logger.error("Cleanup failed for %s: %s", filename, cleanup_error)
+        _update_job(job_id, status="error", error=str(processing_error))
+
+# LLM services are created per API key and cached, so repeated requests reuse
+# warm OpenAI connections. This allows clients (browser extension) to provide their own API keys
+_LLM_CACHE_SIZE = 32
+_llm_cache = OrderedDict()
+_llm_lock = threading.Lock()
+
+def create_llm_service(client_api_key: str = None) -> "LLMService":
+    """
+    Get the (cached) LLM service instance for the client-provided API key or environment variable
     
     Args:
         client_api_key: API key provided by client (browser extension)
@@ -79,84 +331,141 @@ def create_llm_service(client_api_key: str = None) -> LLMService:
         ValueError: If neither client API key nor environment variable is available
     """
     # Prefer client-provided API key, fallback to environment variable
-    api_key = client_api_key or os.getenv('OPENAI_API_KEY')
+    api_key = client_api_key or _BACKEND_API_KEY
     
     if not api_key:
         raise ValueError("No OpenAI API key provided. Either include 'api_key' in request or set OPENAI_API_KEY environment variable")
     
-    return LLMService(api_key=api_key)
+    # Key the cache by a digest so raw API keys aren't kept as dict keys
+    key = hashlib.blake2b(api_key.encode(), digest_size=16).hexdigest()
+    with _llm_lock:
+        llm_service = _llm_cache.get(key)
+        if llm_service is not None:
+            _llm_cache.move_to_end(key)
+            return llm_service
+    
+    from llm_service import LLMService
+    llm_service = LLMService(api_key=api_key)
+    
+    with _llm_lock:
+        llm_service = _llm_cache.setdefault(key, llm_service)
+        _llm_cache.move_to_end(key)
+        while len(_llm_cache) > _LLM_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+    return llm_service
 
 # Source URLs are now stored directly in database metadata - no separate mapping file needed
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_file_status(file_path, db_stats):
-    """Check if a file has been processed into the database"""
-    file_name = os.path.basename(file_path)
-    # Simple heuristic: if we have chunks in DB and file exists, assume it's processed
-    # In a real system, you'd track this more precisely
-    return {
-        'name': file_name,
-        'size': os.path.getsize(file_path),
-        'processed': db_stats['total_chunks'] > 0,  # Simplified check
-        'last_modified': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-    }
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """
+    Identify an uploaded file from its leading bytes
+    
+    Args:
+        head: First bytes of the file (up to 1 KB)
+        
+    Returns:
+        'pdf', 'docx', 'text', or None if the content is not a supported type
+    """
+    for signature, file_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    
+    try:
+        # Incremental decoding tolerates a multi-byte character cut off at the end of the prefix
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+    except UnicodeDecodeError:
+        return None
+    return 'text'
 
-def generate_document_url(source_file: str, source_url: str = None) -> str:
+def build_context_chunks(results: dict, min_confidence: float = None) -> list:
     """
-    Generate a URL to access the source document from database metadata
+    Convert a ChromaDB query result into ContextChunk models
     
     Args:
-        source_file: Name of the source file (not used anymore, kept for compatibility)
-        source_url: Source URL from database metadata
+        results: Query result with 'documents', 'metadatas' and 'distances' for a single query
+        min_confidence: Optional threshold; chunks at or below it are dropped
         
     Returns:
-        Source URL from database metadata
+        List of ContextChunk objects in result order
     """
-    # Return the source URL directly from database metadata
-    return source_url or ""
+    docs, metas, dists = results['documents'][0], results['metadatas'][0], results['distances'][0]
+    return [
+        ContextChunk(
+            text=doc,
+            source_file=metadata.get('source_file', 'unknown'),
+            source=(source_url := metadata.get('source_url')),  # Source URL from database metadata
+            document_url=source_url or "",
+            chunk_index=metadata.get('chunk_index', 0),
+            confidence=round(max(0.0, 1.0 - distance), 3),  # Ensure confidence >= 0
+            distance=round(distance, 3)
+        )
+        for doc, metadata, distance in zip(docs, metas, dists)
+        if min_confidence is None or (1.0 - distance) > min_confidence
+    ]
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    # Check if LLM service is available with backend API key
-    llm_available = False
-    try:
-        backend_api_key = os.getenv('OPENAI_API_KEY')
-        if backend_api_key:
-            # Try to create LLM service to test availability
-            test_llm = create_llm_service()
-            llm_available = True
-    except Exception as e:
-        logger.warning(f"LLM service test failed: {e}")
-        llm_available = False
-    
-    return jsonify({
+    """Health check endpoint (cheap liveness probe)"""
+    return json_response({
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": _now_iso(),
         "database_connected": db is not None,
-        "llm_service_available": llm_available
+        "llm_service_available": bool(_BACKEND_API_KEY)  # LLM service is available when a backend API key is configured
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check endpoint: initializes the database and LLM service to verify they work"""
+    database_ready = _get_db() is not None
+    
+    llm_ready = False
+    try:
+        if _BACKEND_API_KEY:
+            create_llm_service()
+            llm_ready = True
+    except Exception as e:
+        logger.warning("LLM service test failed: %s", e)
+    
+    ready = database_ready and llm_ready
+    return json_response({
+        "status": "ready" if ready else "not_ready",
+        "timestamp": _now_iso(),
+        "database_connected": database_ready,
+        "llm_service_available": llm_ready
+    }), 200 if ready else 503
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get database statistics"""
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         stats = db.get_collection_stats()
-        return jsonify({
+        return json_response({
             "status": "success",
             "stats": stats,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         })
     except Exception as e:
-        logger.error(f"Error getting stats: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error getting stats: %s", e)
+        return json_response({"error": str(e)}), 500
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Get query embedding cache statistics"""
+    info = _embed_cached.cache_info()
+    return json_response({
+        "status": "success",
+        "embedding_cache": {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        },
+        "timestamp": _now_iso()
+    })
 
 @app.route('/api/fact-check', methods=['POST'])
 def fact_check():
@@ -164,54 +473,39 @@ def fact_check():
     Fact-check endpoint for browser extension
     Accepts text and returns LLM-generated fact-checking response with source context
     """
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         # Get request data
         data = request.get_json()
         if not data or 'text' not in data:
-            return jsonify({"error": "Missing 'text' parameter"}), 400
+            return json_response({"error": "Missing 'text' parameter"}), 400
         
         text = data.get('text', '').strip()
         if not text:
-            return jsonify({"error": "Empty text provided"}), 400
+            return json_response({"error": "Empty text provided"}), 400
         
         n_results = min(data.get('n_results', 5), 10)  # Max 10 results
         use_llm = data.get('use_llm', True)  # Allow disabling LLM
         client_api_key = data.get('api_key')  # Client-provided OpenAI API key
         
-        logger.info(f"Fact-checking query: '{text[:100]}...'")
+        logger.info("Fact-checking query: '%s...'", text[:100])
         
-        # Generate OpenAI embeddings for query
-        if not doc_processor:
-            return jsonify({"error": "Document processor not initialized"}), 500
+        # Generate OpenAI embeddings for query (cached, batched with concurrent requests)
+        if not _get_embedding_batcher():
+            return json_response({"error": "Document processor not initialized"}), 500
             
-        query_embeddings = doc_processor.generate_embeddings([text])
-        if not query_embeddings:
-            return jsonify({"error": "Failed to generate query embeddings"}), 500
+        query_embedding = embed_query(text)
+        if not query_embedding:
+            return json_response({"error": "Failed to generate query embeddings"}), 500
         
-        # Query similar documents using embeddings
-        results = db.query_similar_with_embeddings(query_embeddings[0], n_results=n_results)
+        # Query similar documents using embeddings (batched with concurrent requests)
+        results = _get_query_batcher().query(query_embedding, n_results=n_results)
         
         # Format results for context using Pydantic models
-        context_chunks = []
-        if results['documents'][0]:  # Check if we have results
-            for i in range(len(results['documents'][0])):
-                doc = results['documents'][0][i]
-                metadata = results['metadatas'][0][i]
-                distance = results['distances'][0][i]
-                confidence = max(0, 1 - distance)  # Ensure confidence >= 0
-                
-                context_chunks.append(ContextChunk(
-                    text=doc,
-                    source_file=metadata.get('source_file', 'unknown'),
-                    source=metadata.get('source_url'),  # Include source URL from metadata
-                    document_url=generate_document_url(metadata.get('source_file', 'unknown'), metadata.get('source_url')),
-                    chunk_index=metadata.get('chunk_index', 0),
-                    confidence=round(confidence, 3),
-                    distance=round(distance, 3)
-                ))
+        context_chunks = build_context_chunks(results)
         
         # Create structured API response
         api_response = APIFactCheckResponse(
@@ -219,19 +513,17 @@ def fact_check():
             query=text,
             context=context_chunks,
             total_context_chunks=len(context_chunks),
-            timestamp=datetime.now().isoformat()
+            timestamp=_now_iso()
         )
         
         # Generate LLM response if API key provided, LLM requested, and context available
-        if use_llm and context_chunks and (client_api_key or os.getenv('OPENAI_API_KEY')):
+        if use_llm and context_chunks and (client_api_key or _BACKEND_API_KEY):
             try:
                 logger.info("Creating LLM service for fact-check response...")
                 llm_service = create_llm_service(client_api_key)
                 
                 logger.info("Generating LLM fact-check response...")
-                # Convert ContextChunk objects to dicts for LLM service
-                context_dicts = [chunk.model_dump() for chunk in context_chunks]
-                llm_result = llm_service.generate_fact_check_response(text, context_dicts)
+                llm_result = llm_service.generate_fact_check_response(text, context_chunks, query_embedding=query_embedding)
                 
                 if llm_result.status == "success":
                     api_response.fact_check = llm_result.fact_check
@@ -239,25 +531,25 @@ def fact_check():
                     logger.info("LLM fact-check response generated")
                 else:
                     api_response.llm_response = llm_result
-                    logger.warning(f"WARNING: LLM generation failed: {llm_result.error}")
+                    logger.warning("WARNING: LLM generation failed: %s", llm_result.error)
                     
             except ValueError as e:
-                logger.warning(f"WARNING: LLM service creation failed: {e}")
+                logger.warning("WARNING: LLM service creation failed: %s", e)
                 api_response.message = "LLM service requires API key - add 'api_key' to request or set OPENAI_API_KEY environment variable"
             except Exception as e:
-                logger.error(f"ERROR: Unexpected LLM error: {e}")
+                logger.error("ERROR: Unexpected LLM error: %s", e)
                 api_response.message = f"LLM service error: {str(e)}"
         
-        elif not (client_api_key or os.getenv('OPENAI_API_KEY')):
+        elif not (client_api_key or _BACKEND_API_KEY):
             api_response.message = "LLM service requires API key - add 'api_key' to request or set OPENAI_API_KEY environment variable"
         elif not context_chunks:
             api_response.message = "No relevant context found for fact-checking"
         
-        return jsonify(api_response.model_dump())
+        return model_response(_fact_check_adapter, api_response)
         
     except Exception as e:
-        logger.error(f"Error in fact-check endpoint: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error in fact-check endpoint: %s", e)
+        return json_response({"error": str(e)}), 500
 
 @app.route('/api/query', methods=['POST'])
 def general_query():
@@ -265,74 +557,59 @@ def general_query():
     General query endpoint (for Ask feature)
     Similar to fact-check but with different response format
     """
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         # Get request data  
         data = request.get_json()
         if not data or 'text' not in data:
-            return jsonify({"error": "Missing 'text' parameter"}), 400
+            return json_response({"error": "Missing 'text' parameter"}), 400
         
         text = data.get('text', '').strip()
         if not text:
-            return jsonify({"error": "Empty text provided"}), 400
+            return json_response({"error": "Empty text provided"}), 400
         
         n_results = min(data.get('n_results', 3), 10)  # Max 10 results
         client_api_key = data.get('api_key')  # Client-provided OpenAI API key (for future LLM features)
         
-        logger.info(f"General query: '{text[:100]}...'")
+        logger.info("General query: '%s...'", text[:100])
         
-        # Generate OpenAI embeddings for query
-        if not doc_processor:
-            return jsonify({"error": "Document processor not initialized"}), 500
+        # Generate OpenAI embeddings for query (cached, batched with concurrent requests)
+        if not _get_embedding_batcher():
+            return json_response({"error": "Document processor not initialized"}), 500
             
-        query_embeddings = doc_processor.generate_embeddings([text])
-        if not query_embeddings:
-            return jsonify({"error": "Failed to generate query embeddings"}), 500
+        query_embedding = embed_query(text)
+        if not query_embedding:
+            return json_response({"error": "Failed to generate query embeddings"}), 500
         
-        # Query similar documents using embeddings
-        results = db.query_similar_with_embeddings(query_embeddings[0], n_results=n_results)
+        # Query similar documents using embeddings (batched with concurrent requests)
+        results = _get_query_batcher().query(query_embedding, n_results=n_results)
         
         # Format results for general query using Pydantic models
-        context_chunks = []
-        if results['documents'][0]:
-            for i in range(len(results['documents'][0])):
-                doc = results['documents'][0][i]
-                metadata = results['metadatas'][0][i]
-                distance = results['distances'][0][i]
-                confidence = max(0, 1 - distance)
-                
-                if confidence > 0.1:  # Only include reasonably relevant results
-                    context_chunks.append(ContextChunk(
-                        text=doc,
-                        source_file=metadata.get('source_file', 'unknown'),
-                        source=metadata.get('source_url'),  # Include source URL from metadata
-                        document_url=generate_document_url(metadata.get('source_file', 'unknown'), metadata.get('source_url')),
-                        chunk_index=metadata.get('chunk_index', 0),
-                        confidence=round(confidence, 3),
-                        distance=round(distance, 3)
-                    ))
+        context_chunks = build_context_chunks(results, min_confidence=0.1)  # Only include reasonably relevant results
         
         api_response = APIQueryResponse(
             status="success",
             query=text,
             context=context_chunks,
             message=f"Found {len(context_chunks)} relevant context chunks",
-            timestamp=datetime.now().isoformat()
+            timestamp=_now_iso()
         )
         
-        return jsonify(api_response.model_dump())
+        return model_response(_query_adapter, api_response)
         
     except Exception as e:
-        logger.error(f"Error in general query endpoint: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error in general query endpoint: %s", e)
+        return json_response({"error": str(e)}), 500
 
 @app.route('/api/files', methods=['GET'])
 def list_files():
     """List all files in the documents directory with processing status"""
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         docs_path = Path(app.config['UPLOAD_FOLDER'])
@@ -341,187 +618,343 @@ def list_files():
         files = []
         db_stats = db.get_collection_stats()
         
-        for file_path in docs_path.glob('*'):
-            if file_path.is_file() and allowed_file(file_path.name):
-                file_info = get_file_status(file_path, db_stats)
-                files.append(file_info)
+        # scandir entries carry cached stat data, so each file costs a single syscall
+        with os.scandir(docs_path) as it:
+            entries = [entry for entry in it if entry.is_file(follow_symlinks=False)]
+        
+        for entry in entries:
+            name = entry.name
+            dot = name.rfind('.')
+            if dot < 0 or name[dot + 1:].lower() not in ALLOWED_EXTENSIONS:
+                continue
+            
+            st = entry.stat(follow_symlinks=False)
+            # Simple heuristic: if we have chunks in DB and file exists, assume it's processed
+            files.append({
+                'name': name,
+                'size': st.st_size,
+                'processed': db_stats['total_chunks'] > 0,  # Simplified check
+                'last_modified': datetime.fromtimestamp(st.st_mtime).isoformat()
+            })
         
-        return jsonify({
+        return json_response({
             "status": "success",
             "files": files,
             "total_files": len(files),
             "database_stats": db_stats,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         })
         
     except Exception as e:
-        logger.error(f"Error listing files: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error listing files: %s", e)
+        return json_response({"error": str(e)}), 500
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Upload a file to the documents directory"""
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
+            return json_response({"error": "No file provided"}), 400
         
         file = request.files['file']
         if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+            return json_response({"error": "No file selected"}), 400
         
         # Get source URL from form data
         source_url = request.form.get('source_url', '').strip()
         if not source_url:
-            return jsonify({"error": "Source URL is required"}), 400
+            return json_response({"error": "Source URL is required"}), 400
         
-        if not allowed_file(file.filename):
-            return jsonify({
-                "error": f"File type not allowed. Supported: {', '.join(ALLOWED_EXTENSIONS)}"
-            }), 400
-        
-        # Save file
         filename = secure_filename(file.filename)
         docs_path = Path(app.config['UPLOAD_FOLDER'])
         docs_path.mkdir(exist_ok=True)
         file_path = docs_path / filename
         
-        # Check if file already exists
-        if file_path.exists():
-            return jsonify({"error": "File already exists"}), 409
+        # Read the upload into memory (bounded by MAX_CONTENT_LENGTH); it is parsed from
+        # this buffer and written to disk only once processing succeeds
+        data = file.stream.read()
+        
+        # Validate the content itself rather than trusting the filename
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        expected_type = 'text' if extension in TEXT_EXTENSIONS else extension
+        if extension not in ALLOWED_EXTENSIONS or sniff_file_type(data[:1024]) != expected_type:
+            return json_response({
+                "error": f"File type not allowed or content does not match extension. Supported: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+            }), 400
         
-        file.save(str(file_path))
-        logger.info(f"File uploaded: {filename} with source URL: {source_url}")
+        logger.info("File uploaded: %s with source URL: %s", filename, source_url)
         
-        # Process the file immediately after upload
-        try:
-            # Initialize document processor
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                return jsonify({"error": "OpenAI API key not configured"}), 500
-            
-            processor = DocumentProcessor(api_key=api_key)
-            
-            # Process the file with source URL
-            logger.info(f"Processing uploaded file: {filename}")
-            chunks, metadata_list, ids = processor.process_document(str(file_path), source_url)
-            
-            if not chunks:
-                return jsonify({"error": "No content extracted from file"}), 400
-            
-            # Generate embeddings and add to database
-            embeddings = processor.generate_embeddings(chunks)
-            db.add_document_chunks(chunks, metadata_list, ids, embeddings)
-            
-            logger.info(f"File uploaded and processed successfully: {filename} ({len(chunks)} chunks)")
-            
-            return jsonify({
-                "status": "success",
-                "message": "File uploaded and processed successfully",
-                "filename": filename,
-                "source_url": source_url,
-                "chunks_created": len(chunks),
-                "processed": True,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-        except Exception as processing_error:
-            # If processing fails, still keep the uploaded file but log the error
-            logger.error(f"Processing failed for {filename}: {processing_error}")
-            return jsonify({
-                "status": "partial_success", 
-                "message": f"File uploaded but processing failed: {str(processing_error)}",
-                "filename": filename,
-                "source_url": source_url,
-                "processed": False,
-                "timestamp": datetime.now().isoformat()
-            }), 500
+        # Queue processing so the request returns as soon as the upload is accepted
+        job_id = uuid.uuid4().hex
+        now = _now_iso()
+        # Check if file already exists (on disk or still being processed by any worker)
+        if file_path.exists():
+            return json_response({"error": "File already exists"}), 409
+        
+        created = jobs.create({
+            "job_id": job_id,
+            "status": "pending",
+            "filename": filename,
+            "source_url": source_url,
+            "chunks_created": 0,
+            "processed": False,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        })
+        if not created:
+            return json_response({"error": "File already exists"}), 409
+        upload_executor.submit(_process_upload_job, job_id, file_path, data, source_url)
+        
+        return json_response({
+            "status": "pending",
+            "message": "File uploaded, processing started",
+            "job_id": job_id,
+            "filename": filename,
+            "source_url": source_url,
+            "timestamp": now
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error uploading file: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error uploading file: %s", e)
+        return json_response({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the processing status of an uploaded file"""
+    job = jobs.get(job_id)
+    if not job:
+        return json_response({"error": "Job not found"}), 404
+    
+    return json_response(job)
 
-# process-file endpoint removed - processing now happens automatically during upload
+# process-file endpoint removed - processing now happens in the background after upload
 
 @app.route('/api/files/<filename>', methods=['DELETE'])
 def delete_file(filename):
     """Delete a file from both the filesystem and vector database"""
+    db = _get_db()
     if not db:
-        return jsonify({"error": "Database not initialized"}), 500
+        return json_response({"error": "Database not initialized"}), 500
     
     try:
         docs_path = Path(app.config['UPLOAD_FOLDER'])
         file_path = docs_path / filename
         
         if not file_path.exists():
-            return jsonify({"error": "File not found"}), 404
+            return json_response({"error": "File not found"}), 404
         
         # First, delete from vector database
-        logger.info(f"Deleting chunks for file: {filename}")
+        logger.info("Deleting chunks for file: %s", filename)
         chunks_deleted = db.delete_document_by_filename(filename)
         
         # Then delete the physical file
         file_path.unlink()
-        logger.info(f"File deleted: {filename}")
+        logger.info("File deleted: %s", filename)
         
-        return jsonify({
+        return json_response({
             "status": "success",
             "message": "File deleted successfully",
             "filename": filename,
             "chunks_removed": chunks_deleted,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         })
         
     except Exception as e:
-        logger.error(f"Error deleting file {filename}: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error deleting file %s: %s", filename, e)
+        return json_response({"error": str(e)}), 500
 
 
 @app.route('/api/clear-database', methods=['POST'])
 def clear_database():
     """Clear all documents from the database"""
     try:
+        db = _get_db()
         if not db:
-            return jsonify({"error": "Database not initialized"}), 500
+            return json_response({"error": "Database not initialized"}), 500
             
         # Clear the ChromaDB collection
         db.clear_collection()
         logger.info("Database cleared successfully")
         
-        return jsonify({
+        return json_response({
             "status": "success",
             "message": "Database cleared successfully"
         })
         
     except Exception as e:
         error_msg = f"Failed to clear database: {str(e)}"
-        logger.error(f"ERROR: {error_msg}")
-        return jsonify({"error": error_msg}), 500
+        logger.error("ERROR: %s", error_msg)
+        return json_response({"error": error_msg}), 500
 
 
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+    return json_response({"error": "Endpoint not found"}), 404
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({"error": "Internal server error"}), 500
+    return json_response({"error": "Internal server error"}), 500
 
-def main():
-    """Run the Flask development server"""
-    port = int(os.environ.get('PORT', 8877))
-    debug = os.environ.get('DEBUG', 'False').lower() == 'true'
+def warmup():
+    """
+    Pre-load everything the first fact-check request would otherwise pay for:
+    the ChromaDB index, the OpenAI HTTPS session, Pydantic serializers and HNSW caches
+    """
+    started = time.perf_counter()
+    
+    db = _get_db()
+    if db:
+        db.get_collection_stats()
+    
+    query_embedding = None
+    try:
+        if _get_embedding_batcher():
+            query_embedding = _get_embedding_batcher().embed("warmup")
+    except Exception as e:
+        logger.warning("Warm-up embedding failed: %s", e)
+    
+    sample_chunk = ContextChunk(text="warmup", source_file="warmup.txt", chunk_index=0, confidence=1.0, distance=0.0)
+    _fact_check_adapter.dump_json(APIFactCheckResponse(
+        status="success", query="warmup", context=[sample_chunk], total_context_chunks=1, timestamp=_now_iso()
+    ), exclude_none=True)
+    _query_adapter.dump_json(APIQueryResponse(
+        status="success", query="warmup", context=[sample_chunk], message="warmup", timestamp=_now_iso()
+    ), exclude_none=True)
     
-    logger.info(f"Starting fact-checking API server on port {port}")
-    logger.info(f"Debug mode: {debug}")
+    if db and query_embedding:
+        _get_query_batcher().query(query_embedding, n_results=1)
     
+    logger.info("Warm-up completed in %.2fs", time.perf_counter() - started)
+
+def log_database_stats():
+    """Open the database and log its size (the startup stats probe)"""
+    db = _get_db()
     if db:
         stats = db.get_collection_stats()
-        logger.info(f"Database ready with {stats['total_chunks']} chunks")
+        logger.info("Database ready with %s chunks", stats['total_chunks'])
+
+def run_gunicorn(port: int, warmup_workers: bool = False, probe_stats: bool = False):
+    """
+    Serve the app with gunicorn threaded workers
+    
+    For maximum throughput on small-payload endpoints (/api/health, /api/stats) the app can
+    also be run with the meinheld worker instead:
+        gunicorn -k meinheld.gmeinheld.MeinheldWorker --chdir src api:app
+    
+    Args:
+        port: Port to bind on all interfaces
+        warmup_workers: Run warmup() in each worker after it is forked
+        probe_stats: Log database stats in each worker after it is forked
+    """
+    global db, doc_processor, embedding_batcher, query_batcher
+    from gunicorn.app.base import BaseApplication
+    
+    class FactCheckApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+    
+    # Workload is I/O-bound (OpenAI, ChromaDB), so threads per worker matter more than processes.
+    # An embedded PersistentClient is private to its process (uploads would be invisible to other
+    # workers and concurrent HNSW persistence is unsafe), so multiple workers need a Chroma server
+    if os.environ.get('CHROMA_HOST'):
+        workers = int(os.environ.get('WEB_CONCURRENCY', max(2, os.cpu_count() or 1)))
+        threads = int(os.environ.get('GUNICORN_THREADS', 8))
+    else:
+        if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+            logger.warning("WEB_CONCURRENCY ignored: embedded ChromaDB requires a single worker (set CHROMA_HOST to scale out)")
+        workers = 1
+        threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+    options = {
+        "bind": f"0.0.0.0:{port}",
+        "workers": workers,
+        "worker_class": "gthread",
+        "threads": threads,
+        "keepalive": 30,
+    }
+    # Connections, index handles and the database writer thread must be created in the worker,
+    # not inherited across fork
+    with _services_lock:
+        db = doc_processor = embedding_batcher = query_batcher = None
+    
+    def post_worker_init(worker):
+        if probe_stats:
+            log_database_stats()
+        if warmup_workers:
+            warmup()
+    
+    if probe_stats or warmup_workers:
+        options["post_worker_init"] = post_worker_init
+    logger.info("Starting gunicorn with %s workers x %s threads", options['workers'], options['threads'])
+    FactCheckApplication(app, options).run()
+
+# Used when PORT is unset (run_api.py sets it to the same value)
+DEFAULT_PORT = 8877
+
+# Written when the server stops cleanly; its presence on boot means the database
+# was closed properly and the startup stats probe can be skipped
+CLEAN_SHUTDOWN_MARKER = Path("data/.clean_shutdown")
+
+def write_clean_shutdown_marker():
+    """Record that the server stopped cleanly"""
+    try:
+        CLEAN_SHUTDOWN_MARKER.parent.mkdir(parents=True, exist_ok=True)
+        CLEAN_SHUTDOWN_MARKER.write_text(datetime.now().isoformat())
+    except OSError as e:
+        logger.warning("Could not write clean shutdown marker: %s", e)
+
+def main():
+    """Run the API server (gunicorn in production, Flask development server when debugging)"""
+    port = int(os.environ.get('PORT', DEFAULT_PORT))
+    debug = os.environ.get('DEBUG', 'False').lower() == 'true'
+    skip_stats = os.environ.get('SKIP_STATS_ON_BOOT', '0').lower() in ('1', 'true')
+    run_warmup = os.environ.get('WARMUP', '0').lower() in ('1', 'true')
+    
+    logger.info("Starting fact-checking API server on port %s", port)
+    logger.info("Debug mode: %s", debug)
+    
+    if CLEAN_SHUTDOWN_MARKER.exists():
+        logger.info("Clean shutdown detected - skipping stats probe")
+        CLEAN_SHUTDOWN_MARKER.unlink()
+        skip_stats = True
+    
+    # Stop through SystemExit(0) so a SIGTERM counts as a clean shutdown (gunicorn installs its own handler)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server_pid = os.getpid()
+    
+    try:
+        if debug or os.environ.get('FLASK_ENV') == 'development':
+            if not skip_stats:
+                log_database_stats()
+            if run_warmup:
+                warmup()
+            app.run(host='0.0.0.0', port=port, debug=debug)
+        else:
+            # The gunicorn master forks its workers, so the probe runs in each worker instead
+            run_gunicorn(port, warmup_workers=run_warmup, probe_stats=not skip_stats)
+    except SystemExit as e:
+        # gunicorn halts with a non-zero status when workers fail to boot or the arbiter crashes;
+        # forked workers also unwind through here and must not write the marker
+        if e.code in (0, None) and os.getpid() == server_pid:
+            write_clean_shutdown_marker()
+        raise
     
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    if os.getpid() == server_pid:
+        write_clean_shutdown_marker()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
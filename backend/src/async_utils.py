@@ -0,0 +1,62 @@
+"""
+Shared background event loop for running async OpenAI calls from synchronous code
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the background event loop, starting its thread on first use
+
+    The loop is recreated after a fork (e.g. in gunicorn workers), since the
+    thread running it does not survive into the child process.
+
+    Returns:
+        Event loop running in a daemon thread
+    """
+    global _loop, _loop_pid
+
+    if _loop is None or _loop_pid != os.getpid():
+        with _loop_lock:
+            if _loop is None or _loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-loop", daemon=True).start()
+                _loop = loop
+                _loop_pid = os.getpid()
+    return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes
+
+    Unlike asyncio.run, this keeps one long-lived loop so async clients (and their
+    connection pools) can be reused across calls and threads.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait for the result (None waits indefinitely)
+
+    Returns:
+        The coroutine's result
+    """
+    loop = get_event_loop()
+
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the background loop; await the coroutine instead")
+
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
@@ -0,0 +1,165 @@
+"""
+Micro-batching for concurrent requests
+Coalesces work items that arrive within a short window into a single call
+(one OpenAI embeddings request, one ChromaDB query) and fans results back to callers
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _BatchJob:
+    """A single item waiting for its result"""
+
+    __slots__ = ("item", "done", "result", "error")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 10.0):
+        """
+        Base class collecting concurrent submissions and resolving them with one batched call
+
+        Subclasses implement _process_batch(items) returning one result per item.
+
+        Args:
+            max_batch: Maximum number of items processed in a single call
+            max_wait_ms: How long the first queued item waits for others to join its batch
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_BatchJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, item: Any) -> Any:
+        """
+        Queue an item and block until its batch has been processed
+
+        Args:
+            item: Work item passed to _process_batch
+
+        Returns:
+            Result for this item
+        """
+        self._ensure_worker()
+
+        job = _BatchJob(item)
+        self._queue.put(job)
+        job.done.wait()
+
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _process_batch(self, items: List[Any]) -> List[Any]:
+        """Process a batch of items, returning results in the same order"""
+        raise NotImplementedError
+
+    def _ensure_worker(self):
+        """Start the background worker thread on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[_BatchJob]:
+        """Block for the first job, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Worker loop: drain the queue in batches and fan results back to waiters"""
+        while True:
+            batch = self._collect_batch()
+            try:
+                results = self._process_batch([job.item for job in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Expected {len(batch)} results, got {len(results)}")
+                for job, result in zip(batch, results):
+                    job.result = result
+            except Exception as e:
+                for job in batch:
+                    job.error = e
+            finally:
+                for job in batch:
+                    job.done.set()
+
+
+class EmbeddingBatcher(MicroBatcher):
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = 64, max_wait_ms: float = 10.0):
+        """
+        Coalesce concurrent query embeddings into one embeddings API call
+
+        Args:
+            embed_fn: Function embedding a list of texts (e.g. DocumentProcessor.generate_embeddings)
+            max_batch: Maximum number of texts sent in a single call
+            max_wait_ms: How long the first queued text waits for others to join its batch
+        """
+        super().__init__(max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.embed_fn = embed_fn
+
+    def embed(self, text: str) -> List[float]:
+        """Embed a single text, sharing the API round-trip with concurrent callers"""
+        return self.submit(text)
+
+    def _process_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_fn(texts)
+
+
+class QueryBatcher(MicroBatcher):
+    def __init__(self, query_fn: Callable[[List[List[float]], int], Dict],
+                 max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Coalesce concurrent similarity searches into one multi-vector ChromaDB query
+
+        Args:
+            query_fn: Function querying several embeddings at once (e.g. FactCheckDatabase.query_similar_batch)
+            max_batch: Maximum number of query vectors sent in a single call
+            max_wait_ms: How long the first queued query waits for others to join its batch
+        """
+        super().__init__(max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.query_fn = query_fn
+
+    def query(self, query_embedding: List[float], n_results: int = 5) -> Dict:
+        """
+        Find similar chunks for one embedding, sharing the database call with concurrent callers
+
+        Returns:
+            Query result shaped like a single-vector ChromaDB query ({'documents': [[...]], ...})
+        """
+        return self.submit((query_embedding, n_results))
+
+    def _process_batch(self, items: List[tuple]) -> List[Dict]:
+        # One query at the largest requested size; each caller gets its own slice back
+        max_results = max(n_results for _, n_results in items)
+        results = self.query_fn([embedding for embedding, _ in items], max_results)
+
+        return [
+            {
+                key: [results[key][i][:n_results]]
+                for key in ('ids', 'documents', 'metadatas', 'distances')
+            }
+            for i, (_, n_results) in enumerate(items)
+        ]
@@ -3,37 +3,138 @@ Database setup and management for fact-checking system using ChromaDB
 """
 
 import chromadb
-import os
-from typing import Dict, List, Optional
+import numpy as np
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
+# Embedding size for new collections (text-embedding-3 models can return shortened vectors)
+DEFAULT_EMBEDDING_DIM = 512
+
+# Chunks per collection.add call, and writes that can wait for the writer thread before callers block
+WRITE_BATCH_SIZE = 250
+WRITE_QUEUE_SIZE = 8
+
+# IDs per collection.delete call, so large deletes don't run as one huge transaction
+DELETE_BATCH_SIZE = 500
+# IDs per collection.delete call when clearing the whole collection
+CLEAR_BATCH_SIZE = 10_000
+
+def configure_hnsw_params(vector_count: int) -> Tuple[int, int, int]:
+    """
+    Suggest HNSW index parameters for the expected collection size
+    
+    Args:
+        vector_count: Expected number of stored vectors
+        
+    Returns:
+        Tuple of (M, ef_construction, ef_search)
+    """
+    if vector_count < 10_000:
+        return 16, 100, 50
+    if vector_count < 1_000_000:
+        return 24, 100, 100
+    if vector_count < 10_000_000:
+        return 32, 200, 150
+    return 48, 400, 200
+
+# Embeddings may be passed as nested float lists or as a float ndarray
+Embeddings = Union[List[List[float]], np.ndarray]
+
+def _round_to_float16(embeddings: Embeddings) -> List[List[float]]:
+    """Round embeddings to float16 precision, returned as the float lists Chroma expects"""
+    return np.asarray(embeddings, dtype=np.float16).astype(np.float32).tolist()
+
+def _as_embedding_rows(embeddings: Embeddings) -> List[List[float]]:
+    """
+    Normalize one embedding or a batch of them into a list of float rows
+    
+    ChromaDB 0.4 validates embeddings as Python lists and rejects ndarrays, so arrays are
+    converted here in a single C-level pass instead of by the caller.
+    """
+    if len(embeddings) == 0:
+        return []
+    return np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, np.shape(embeddings)[-1]).tolist()
+
+
 class FactCheckDatabase:
-    def __init__(self, db_path: str = "./data/chroma_db"):
+    def __init__(self, db_path: str = "./data/chroma_db", float16_embeddings: bool = True,
+                 embedding_dim: Optional[int] = DEFAULT_EMBEDDING_DIM,
+                 hnsw_M: int = 24, hnsw_ef_construction: int = 100, hnsw_ef_search: int = 100,
+                 mode: str = "persistent", host: str = "localhost", port: int = 8000):
         """
         Initialize ChromaDB client and collection for fact-checking documents
         
         Args:
             db_path: Path to store the persistent ChromaDB data
+            float16_embeddings: Round stored embeddings to float16 precision
+            embedding_dim: Embedding size for a newly created collection (None for the model's
+                           native size). An existing collection keeps the size it was created with.
+            hnsw_M: HNSW graph links per node for a newly created collection
+            hnsw_ef_construction: HNSW candidate list size while building the index
+            hnsw_ef_search: HNSW candidate list size while querying
+            mode: "persistent" runs ChromaDB in-process on db_path; "http" connects to a
+                  ChromaDB server, moving SQLite and index work out of this process
+            host: ChromaDB server host (http mode)
+            port: ChromaDB server port (http mode)
+            
+        See configure_hnsw_params for values suited to a given collection size.
         """
-        self.db_path = db_path
+        if mode not in ("persistent", "http"):
+            raise ValueError(f"Unknown database mode: {mode}")
+        
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.db_path = db_path if mode == "persistent" else f"http://{host}:{port}"
+        self.float16_embeddings = float16_embeddings
+        self.embedding_dim = embedding_dim
+        self.hnsw_params = {
+            "hnsw:space": "cosine",
+            "hnsw:M": hnsw_M,
+            "hnsw:construction_ef": hnsw_ef_construction,
+            "hnsw:search_ef": hnsw_ef_search,
+        }
         self.client = None
         self.collection = None
+        
+        # Writes are applied by a single background thread fed through a bounded queue
+        self._write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        
         self._initialize_db()
     
     def _initialize_db(self):
         """Initialize ChromaDB client and create/get collection"""
         try:
-            # Create persistent ChromaDB client
-            self.client = chromadb.PersistentClient(path=self.db_path)
-            
-            # Create or get collection for fact-checking documents
-            self.collection = self.client.get_or_create_collection(
-                name="fact_check_documents",
-                metadata={
-                    "description": "Document chunks for fact-checking with embeddings",
-                    "created_at": datetime.now().isoformat()
-                }
-            )
+            if self.mode == "http":
+                # Connect to a ChromaDB server
+                self.client = chromadb.HttpClient(host=self.host, port=str(self.port))
+            else:
+                # Create persistent ChromaDB client
+                self.client = chromadb.PersistentClient(path=self.db_path)
+            
+            # Stay under SQLite's bound-parameter limit, which Chroma exposes as max_batch_size
+            # (looked up once, since the HTTP client asks the server each time)
+            self.max_batch_size = getattr(self.client, "max_batch_size", None)
+            
+            # Get or create collection for fact-checking documents. get_or_create_collection would
+            # overwrite the stored metadata, including the embedding size the data was written with.
+            # (Checked via list_collections: a missing collection raises ValueError in-process but a
+            # plain Exception over HTTP.)
+            if any(c.name == "fact_check_documents" for c in self.client.list_collections()):
+                self.collection = self.client.get_collection(name="fact_check_documents")
+            else:
+                self.collection = self.client.create_collection(
+                    name="fact_check_documents",
+                    metadata=self._collection_metadata(created_at=datetime.now().isoformat())
+                )
+            
+            # Collections created before embedding_dim was recorded hold native-size vectors
+            self.embedding_dim = (self.collection.metadata or {}).get("embedding_dim")
             
             print(f"Database initialized successfully at: {self.db_path}")
             print(f"Collection 'fact_check_documents' ready")
@@ -42,42 +143,109 @@ class FactCheckDatabase:
             print(f"ERROR: Error initializing database: {e}")
             raise
     
-    def add_document_chunks(self, chunks: List[str], metadatas: List[Dict], ids: List[str], embeddings: List[List[float]] = None):
+    def _collection_metadata(self, **extra) -> Dict:
+        """Build the metadata for a new collection"""
+        metadata = {"description": "Document chunks for fact-checking with embeddings", **self.hnsw_params, **extra}
+        if self.embedding_dim is not None:
+            metadata["embedding_dim"] = self.embedding_dim
+        return metadata
+    
+    def add_document_chunks(self, chunks: List[str], metadatas: List[Dict], ids: List[str], embeddings: Optional[Embeddings] = None) -> Future:
         """
-        Add document chunks to the collection
+        Queue document chunks to be added to the collection by the writer thread
         
         Args:
             chunks: List of text chunks
             metadatas: List of metadata dictionaries for each chunk
             ids: List of unique IDs for each chunk
-            embeddings: Optional pre-computed embeddings (if None, ChromaDB will generate them)
+            embeddings: Optional pre-computed embeddings, as lists or an (N, D) ndarray (if None, ChromaDB will generate them)
+            
+        Returns:
+            Future resolving to the number of chunks added once they are written
+            (or raising the write error); call flush() to wait for all queued writes
         """
-        try:
+        return self._enqueue_write(chunks, metadatas, ids, embeddings, WRITE_BATCH_SIZE)
+    
+    def add_document_chunks_bulk(self, chunks: List[str], metadatas: List[Dict], ids: List[str], embeddings: Embeddings, batch_size: int = 250):
+        """
+        Add a large number of document chunks in fixed-size batches, waiting until they are written
+        
+        Args:
+            chunks: List of text chunks
+            metadatas: List of metadata dictionaries for each chunk
+            ids: List of unique IDs for each chunk
+            embeddings: Pre-computed embeddings for each chunk, as lists or an (N, D) ndarray
+            batch_size: Chunks per collection.add call (capped at the client's max batch size)
+        """
+        self._enqueue_write(chunks, metadatas, ids, embeddings, batch_size).result()
+    
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self._write_queue.join()
+    
+    def _enqueue_write(self, chunks: List[str], metadatas: List[Dict], ids: List[str],
+                       embeddings: Optional[Embeddings], batch_size: int) -> Future:
+        """Hand a write to the writer thread (blocking while the queue is full)"""
+        self._ensure_writer()
+        future = Future()
+        self._write_queue.put((chunks, metadatas, ids, embeddings, batch_size, future))
+        return future
+    
+    def _ensure_writer(self):
+        """Start the writer thread on first use (so it is created after a fork, e.g. in gunicorn workers)"""
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name="chroma-writer", daemon=True)
+                self._writer.start()
+    
+    def _writer_loop(self):
+        """Apply queued writes one at a time, so callers never block on Chroma's SQLite transactions"""
+        while True:
+            chunks, metadatas, ids, embeddings, batch_size, future = self._write_queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    self._write_chunks(chunks, metadatas, ids, embeddings, batch_size)
+                    future.set_result(len(chunks))
+            except Exception as e:
+                print(f"ERROR: Error adding documents: {e}")
+                future.set_exception(e)
+            finally:
+                self._write_queue.task_done()
+    
+    def _write_chunks(self, chunks: List[str], metadatas: List[Dict], ids: List[str],
+                      embeddings: Optional[Embeddings], batch_size: int):
+        """Add chunks to the collection in slices of batch_size"""
+        if self.max_batch_size:
+            batch_size = min(batch_size, self.max_batch_size)
+        
+        if embeddings is not None:
+            embeddings = _round_to_float16(embeddings) if self.float16_embeddings else _as_embedding_rows(embeddings)
+        
+        for start in range(0, len(chunks), batch_size):
+            end = start + batch_size
             if embeddings is not None:
                 self.collection.add(
-                    documents=chunks,
-                    metadatas=metadatas,
-                    ids=ids,
-                    embeddings=embeddings
+                    documents=chunks[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end]
                 )
             else:
                 self.collection.add(
-                    documents=chunks,
-                    metadatas=metadatas,
-                    ids=ids
+                    documents=chunks[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
                 )
-            print(f"Added {len(chunks)} document chunks to database")
-            
-        except Exception as e:
-            print(f"ERROR: Error adding documents: {e}")
-            raise
+        print(f"Added {len(chunks)} document chunks to database")
     
-    def query_similar_with_embeddings(self, query_embeddings: List[float], n_results: int = 5) -> Dict:
+    def query_similar_with_embeddings(self, query_embeddings: Union[List[float], np.ndarray], n_results: int = 5) -> Dict:
         """
         Query for similar document chunks using pre-computed embeddings
         
         Args:
-            query_embeddings: Pre-computed embedding vector for the query
+            query_embeddings: Pre-computed embedding vector for the query (list or 1-D ndarray)
             n_results: Number of results to return
             
         Returns:
@@ -85,7 +253,7 @@ class FactCheckDatabase:
         """
         try:
             results = self.collection.query(
-                query_embeddings=[query_embeddings],
+                query_embeddings=_as_embedding_rows(query_embeddings),
                 n_results=n_results
             )
             return results
@@ -94,6 +262,28 @@ class FactCheckDatabase:
             print(f"ERROR: Error querying database: {e}")
             return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
     
+    def query_similar_batch(self, query_embeddings: Embeddings, n_results: int = 5) -> Dict:
+        """
+        Query for similar document chunks for several embeddings in a single call
+        
+        Args:
+            query_embeddings: Pre-computed query embedding vectors (list of lists or 2-D ndarray)
+            n_results: Number of results to return per query
+            
+        Returns:
+            Dictionary with one list of chunks, metadata and distances per query
+        """
+        try:
+            return self.collection.query(
+                query_embeddings=_as_embedding_rows(query_embeddings),
+                n_results=n_results
+            )
+            
+        except Exception as e:
+            print(f"ERROR: Error querying database: {e}")
+            empty = [[] for _ in query_embeddings]
+            return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+    
     def get_collection_stats(self) -> Dict:
         """Get statistics about the collection"""
         try:
@@ -144,31 +334,45 @@ class FactCheckDatabase:
             Number of chunks deleted
         """
         try:
-            # Delete all chunks with matching source_file metadata
-            result = self.collection.delete(
-                where={'source_file': {'$eq': filename}}
-            )
+            # Apply queued writes first so chunks still waiting for the writer are deleted too
+            self.flush()
+            
+            # Look up the matching IDs first so we can delete in small transactions and report a real count
+            ids = self.collection.get(where={'source_file': filename}, include=[])['ids']
+            
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                self.collection.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
             
-            # ChromaDB delete returns None, so we need to check differently
-            print(f"Deleted all chunks for file: {filename}")
-            return 1  # Simplified return - indicates success
+            print(f"Deleted {len(ids)} chunks for file: {filename}")
+            return len(ids)
             
         except Exception as e:
             print(f"ERROR: Error deleting document chunks for {filename}: {e}")
             raise
     
-    def clear_collection(self):
-        """Clear all documents from the collection (useful for testing)"""
+    def clear_collection(self, hard: bool = False):
+        """
+        Clear all documents from the collection (useful for testing)
+        
+        Args:
+            hard: Drop and recreate the collection instead of deleting its chunks in place,
+                  which also resets its index settings to the current defaults
+        """
         try:
-            # Delete and recreate collection
-            self.client.delete_collection("fact_check_documents")
-            self.collection = self.client.create_collection(
-                name="fact_check_documents",
-                metadata={
-                    "description": "Document chunks for fact-checking with embeddings",
-                    "cleared_at": datetime.now().isoformat()
-                }
-            )
+            self.flush()
+            
+            if hard:
+                # Delete and recreate collection (keeping its embedding size, which query embeddings are built for)
+                self.client.delete_collection("fact_check_documents")
+                self.collection = self.client.create_collection(
+                    name="fact_check_documents",
+                    metadata=self._collection_metadata(cleared_at=datetime.now().isoformat())
+                )
+            else:
+                # Delete chunks in place, keeping the collection, its index files and HNSW settings
+                ids = self.collection.get(include=[])['ids']
+                for start in range(0, len(ids), CLEAR_BATCH_SIZE):
+                    self.collection.delete(ids=ids[start:start + CLEAR_BATCH_SIZE])
             print("Collection cleared successfully")
             
         except Exception as e:
@@ -199,6 +403,7 @@ def test_database():
     
     # Add test data
     db.add_document_chunks(sample_chunks, sample_metadata, sample_ids)
+    db.flush()
     
     # Test querying
     query = "How old is Earth?"
@@ -3,49 +3,80 @@ Document processing pipeline for fact-checking database
 Handles multiple document formats and creates embeddings for ChromaDB
 """
 
+import asyncio
+import csv
+import io
 import os
 import re
 import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 import hashlib
 from datetime import datetime
 
 # Document processing imports
-import PyPDF2
+import pypdf
 from docx import Document
-import pandas as pd
+import tiktoken
 from tqdm import tqdm
 
 # OpenAI for embeddings
 import openai
-from openai import OpenAI
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 # Database
-from database import FactCheckDatabase
+from database import DEFAULT_EMBEDDING_DIM, FactCheckDatabase
+from async_utils import run_sync
+from embedding_cache import EmbeddingCache
+from openai_clients import get_async_openai_client, get_openai_client
 
+# Embedding batches in flight at once per generate_embeddings call
+EMBEDDING_CONCURRENCY = 16
 
-class DocumentProcessor:
-    def __init__(self, api_key: str = None, embedding_model: str = "text-embedding-3-small"):
-        """
-        Initialize document processor with OpenAI embeddings
-        
-        Args:
-            api_key: OpenAI API key
-            embedding_model: OpenAI embedding model name
-        """
-        self.embedding_model_name = embedding_model
-        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        
-        if not self.api_key:
-            raise ValueError("OpenAI API key required. Provide api_key parameter or set OPENAI_API_KEY environment variable")
-        
-        print(f"Using OpenAI embedding model: {embedding_model}")
-        self.client = OpenAI(api_key=self.api_key)
-        print("OpenAI client initialized successfully")
-        
+# Files buffered between pipeline stages in process_directory
+PIPELINE_QUEUE_SIZE = 4
+
+# OpenAI Batch API limit on requests per input file
+BATCH_API_MAX_REQUESTS = 50000
+
+# Transient OpenAI errors worth retrying (rate limits, dropped connections, 5xx)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Text cleaning patterns: keep word characters, whitespace and basic punctuation
+_WHITESPACE_RE = re.compile(r'\s+')
+_DISALLOWED_RE = re.compile(r'[^\w\s.,!?;:()\-]')
+# Same filter for ASCII as a translate table, which avoids a regex pass for most text
+_ASCII_DISALLOWED_TABLE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if _DISALLOWED_RE.match(chr(c))
+))
+
+
+# Tokenizer used by the text-embedding-3 models, so chunk sizes match what the model sees
+CHUNK_ENCODING = "cl100k_base"
+# How far back from a chunk's end to look for a sentence ending, and the tokens that count as one
+SENTENCE_SEARCH_TOKENS = 64
+SENTENCE_END_BYTES = (b'.', b'!', b'?')
+
+
+@lru_cache(maxsize=None)
+def _get_encoding() -> Optional["tiktoken.Encoding"]:
+    """Load the chunking tokenizer once per process (None if it can't be loaded, e.g. offline on first use)"""
+    try:
+        return tiktoken.get_encoding(CHUNK_ENCODING)
+    except Exception as e:
+        print(f"WARNING: Could not load {CHUNK_ENCODING} tokenizer, falling back to character chunking: {e}")
+        return None
+
+
+class DocumentParser:
+    def __init__(self):
+        """Initialize a parser for extracting, cleaning and chunking documents (no API access needed)"""
         # Supported file extensions
-        self.supported_formats = {'.txt', '.pdf', '.docx', '.csv'}
+        self.supported_formats = frozenset({'.txt', '.pdf', '.docx', '.csv'})
     
     def extract_text_from_file(self, file_path: str) -> str:
         """
@@ -58,17 +89,34 @@ class DocumentProcessor:
             Extracted text content
         """
         file_path = Path(file_path)
+        return self._extract_text(file_path, file_path)
+    
+    def extract_text_from_bytes(self, data: bytes, file_name: str) -> str:
+        """
+        Extract text from an in-memory document (e.g. an upload not yet written to disk)
+        
+        Args:
+            data: Raw file contents
+            file_name: Name of the file, used to determine its format
+            
+        Returns:
+            Extracted text content
+        """
+        return self._extract_text(io.BytesIO(data), Path(file_name))
+    
+    def _extract_text(self, source, file_path: Path) -> str:
+        """Dispatch to the extractor for the file's format; source is a path or binary file object"""
         extension = file_path.suffix.lower()
         
         try:
             if extension == '.txt':
-                return self._extract_from_txt(file_path)
+                return self._extract_from_txt(source)
             elif extension == '.pdf':
-                return self._extract_from_pdf(file_path)
+                return self._extract_from_pdf(source)
             elif extension == '.docx':
-                return self._extract_from_docx(file_path)
+                return self._extract_from_docx(source)
             elif extension == '.csv':
-                return self._extract_from_csv(file_path)
+                return self._extract_from_csv(source, file_path.name)
             else:
                 print(f"WARNING: Unsupported file format: {extension}")
                 return ""
@@ -77,35 +125,39 @@ class DocumentProcessor:
             print(f"ERROR: Error processing {file_path}: {e}")
             return ""
     
-    def _extract_from_txt(self, file_path: Path) -> str:
+    def _extract_from_txt(self, source) -> str:
         """Extract text from TXT file"""
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+        if isinstance(source, Path):
+            with open(source, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        return source.read().decode('utf-8', errors='ignore')
     
-    def _extract_from_pdf(self, file_path: Path) -> str:
+    def _extract_from_pdf(self, source) -> str:
         """Extract text from PDF file"""
-        text = ""
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-    
-    def _extract_from_docx(self, file_path: Path) -> str:
+        reader = pypdf.PdfReader(source)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    
+    def _extract_from_docx(self, source) -> str:
         """Extract text from DOCX file"""
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    
-    def _extract_from_csv(self, file_path: Path) -> str:
-        """Extract text from CSV file (converts to readable format)"""
-        df = pd.read_csv(file_path)
-        # Convert DataFrame to a readable text format
-        text = f"Data from {file_path.name}:\n\n"
-        text += df.to_string(index=False)
-        return text
+        return "\n".join(paragraph.text for paragraph in Document(source).paragraphs)
+    
+    def _extract_from_csv(self, source, file_name: str) -> str:
+        """Extract text from CSV file (one "column=value | ..." line per row)"""
+        if isinstance(source, Path):
+            f = open(source, 'r', encoding='utf-8', errors='ignore', newline='')
+        else:
+            f = io.TextIOWrapper(source, encoding='utf-8', errors='ignore', newline='')
+        
+        with f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return ""
+            rows = "\n".join(
+                " | ".join(f"{column}={value}" for column, value in zip(header, row))
+                for row in reader
+            )
+        return f"Data from {file_name}:\n\n{rows}"
     
     def clean_text(self, text: str) -> str:
         """
@@ -117,27 +169,59 @@ class DocumentProcessor:
         Returns:
             Cleaned text
         """
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        
         # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:()\-]', '', text)
+        text = text.translate(_ASCII_DISALLOWED_TABLE)
+        if not text.isascii():
+            text = _DISALLOWED_RE.sub('', text)
         
-        return text
+        # Remove extra whitespace and normalize
+        return _WHITESPACE_RE.sub(' ', text).strip()
     
-    def chunk_text(self, text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
+    def chunk_text(self, text: str, chunk_tokens: int = 512, overlap_tokens: int = 64) -> List[str]:
         """
-        Split text into overlapping chunks for better context preservation
+        Split text into overlapping token-based chunks for better context preservation
         
         Args:
             text: Text to chunk
-            chunk_size: Maximum characters per chunk
-            overlap: Characters to overlap between chunks
+            chunk_tokens: Maximum tokens per chunk (as counted by the embedding model's tokenizer)
+            overlap_tokens: Tokens to overlap between chunks
             
         Returns:
             List of text chunks
         """
+        encoding = _get_encoding()
+        if encoding is None:
+            return self._chunk_text_by_chars(text)
+        
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= chunk_tokens:
+            return [text]
+        
+        chunks = []
+        start = 0
+        
+        while start < len(tokens):
+            end = min(start + chunk_tokens, len(tokens))
+            
+            # Try to break at sentence boundary within the last SENTENCE_SEARCH_TOKENS tokens
+            if end < len(tokens):
+                for i in range(end - 1, max(start, end - SENTENCE_SEARCH_TOKENS) - 1, -1):
+                    if encoding.decode_single_token_bytes(tokens[i]).rstrip().endswith(SENTENCE_END_BYTES):
+                        end = i + 1
+                        break
+            
+            chunk = encoding.decode(tokens[start:end]).strip()
+            if chunk:
+                chunks.append(chunk)
+            
+            if end >= len(tokens):
+                break
+            start = max(end - overlap_tokens, start + 1)
+        
+        return chunks
+    
+    def _chunk_text_by_chars(self, text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
+        """Split text into overlapping character-based chunks (used when no tokenizer is available)"""
         if len(text) <= chunk_size:
             return [text]
         
@@ -149,16 +233,15 @@ class DocumentProcessor:
             
             # Try to break at sentence boundary
             if end < len(text):
-                # Look for sentence endings in the last 100 characters
-                last_part = text[end-100:end]
+                # Look for sentence endings in the last 100 characters (searched in place, no slice copy)
                 sentence_end = max(
-                    last_part.rfind('.'),
-                    last_part.rfind('!'),
-                    last_part.rfind('?')
+                    text.rfind('.', end - 100, end),
+                    text.rfind('!', end - 100, end),
+                    text.rfind('?', end - 100, end)
                 )
                 
                 if sentence_end != -1:
-                    end = end - 100 + sentence_end + 1
+                    end = sentence_end + 1
             
             chunk = text[start:end].strip()
             if chunk:
@@ -168,45 +251,31 @@ class DocumentProcessor:
         
         return chunks
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def process_document(self, file_path: str, source_url: str = "") -> Tuple[List[str], List[Dict], List[str]]:
         """
-        Generate embeddings for texts using OpenAI API
+        Process a single document into chunks with metadata
         
         Args:
-            texts: List of text strings to embed
+            file_path: Path to document file
+            source_url: Source URL for the document (stored in metadata)
             
         Returns:
-            List of embedding vectors
+            Tuple of (chunks, metadata_list, ids)
         """
-        try:
-            # OpenAI API has a limit on batch size, so we process in batches
-            embeddings = []
-            batch_size = 100  # Adjust based on OpenAI limits
-            
-            for i in tqdm(range(0, len(texts), batch_size), desc="Generating embeddings"):
-                batch = texts[i:i + batch_size]
-                
-                response = self.client.embeddings.create(
-                    model=self.embedding_model_name,
-                    input=batch
-                )
-                
-                batch_embeddings = [data.embedding for data in response.data]
-                embeddings.extend(batch_embeddings)
-            
-            print(f"Generated {len(embeddings)} embeddings")
-            return embeddings
-            
-        except Exception as e:
-            print(f"ERROR: Error generating embeddings: {e}")
-            raise
+        file_path = Path(file_path)
+        print(f"Processing: {file_path.name}")
+        
+        # Extract text
+        raw_text = self.extract_text_from_file(file_path)
+        return self._chunk_document(raw_text, file_path, source_url)
     
-    def process_document(self, file_path: str, source_url: str = "") -> Tuple[List[str], List[Dict], List[str]]:
+    def process_bytes(self, data: bytes, file_path: str, source_url: str = "") -> Tuple[List[str], List[Dict], List[str]]:
         """
-        Process a single document into chunks with metadata
+        Process an in-memory document into chunks with metadata, without reading it from disk
         
         Args:
-            file_path: Path to document file
+            data: Raw file contents
+            file_path: Path the document is (or will be) stored at, used for its format and metadata
             source_url: Source URL for the document (stored in metadata)
             
         Returns:
@@ -216,7 +285,11 @@ class DocumentProcessor:
         print(f"Processing: {file_path.name}")
         
         # Extract text
-        raw_text = self.extract_text_from_file(file_path)
+        raw_text = self.extract_text_from_bytes(data, file_path.name)
+        return self._chunk_document(raw_text, file_path, source_url)
+    
+    def _chunk_document(self, raw_text: str, file_path: Path, source_url: str) -> Tuple[List[str], List[Dict], List[str]]:
+        """Clean and chunk extracted text, building metadata and IDs for each chunk"""
         if not raw_text:
             print(f"WARNING: No text extracted from {file_path.name}")
             return [], [], []
@@ -229,7 +302,7 @@ class DocumentProcessor:
         print(f"  Created {len(chunks)} chunks")
         
         # Generate metadata for each chunk
-        file_hash = hashlib.md5(str(file_path).encode()).hexdigest()[:8]
+        file_hash = hashlib.blake2b(str(file_path).encode(), digest_size=4).hexdigest()
         metadata_list = []
         ids = []
         
@@ -251,28 +324,201 @@ class DocumentProcessor:
             ids.append(chunk_id)
         
         return chunks, metadata_list, ids
+
+
+def _load_sentence_transformer(model_name: str):
+    """Load a local sentence-transformers model, on the GPU when one is available"""
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("Local embedding models require sentence-transformers: pip install sentence-transformers") from e
+    
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"Loading {model_name} on {device}")
+    return SentenceTransformer(model_name, device=device)
+
+
+# Parser used by _extract_clean_chunk, created once per worker process
+_worker_parser: Optional[DocumentParser] = None
+
+
+def _extract_clean_chunk(file_path: Path) -> Tuple[List[str], List[Dict], List[str]]:
+    """
+    Extract, clean and chunk a single file (module-level so it can run in a process pool)
+    
+    Args:
+        file_path: Path to document file
+        
+    Returns:
+        Tuple of (chunks, metadata_list, ids)
+    """
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = DocumentParser()
+    return _worker_parser.process_document(file_path)
+
+
+class DocumentProcessor(DocumentParser):
+    def __init__(self, api_key: str = None, embedding_model: str = "text-embedding-3-small",
+                 cache_path: Optional[str] = "./data/embedding_cache.db",
+                 embedding_dim: Optional[int] = DEFAULT_EMBEDDING_DIM):
+        """
+        Initialize document processor with OpenAI or local sentence-transformers embeddings
+        
+        Args:
+            api_key: OpenAI API key (not needed for local models)
+            embedding_model: OpenAI embedding model name ("text-embedding-*"), or any other
+                             name to run that sentence-transformers model locally
+            cache_path: SQLite file for caching embeddings across runs (None disables the cache)
+            embedding_dim: Embedding size to request (None for the model's native size); must
+                           match the collection's FactCheckDatabase.embedding_dim. Local models
+                           always use their native size.
+        """
+        super().__init__()
+        self.embedding_model_name = embedding_model
+        self.client = None
+        self.aclient = None
+        self.encoder = None
+        
+        if not embedding_model.startswith("text-embedding-"):
+            print(f"Using local embedding model: {embedding_model}")
+            self.encoder = _load_sentence_transformer(embedding_model)
+            self.embedding_dim = None
+            self.embedding_params = {}
+            self.api_key = None
+        else:
+            self.embedding_dim = embedding_dim
+            # Extra embeddings.create arguments; dimensions is only sent when shortening vectors
+            self.embedding_params = {"dimensions": embedding_dim} if embedding_dim else {}
+            self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+            
+            if not self.api_key:
+                raise ValueError("OpenAI API key required. Provide api_key parameter or set OPENAI_API_KEY environment variable")
+            
+            print(f"Using OpenAI embedding model: {embedding_model} ({embedding_dim or 'native'} dimensions)")
+            self.client = get_openai_client(self.api_key)
+            self.aclient = get_async_openai_client(self.api_key)
+            print("OpenAI client initialized successfully")
+        
+        self.embedding_cache = EmbeddingCache(cache_path) if cache_path else None
     
-    def process_directory(self, input_dir: str, db: FactCheckDatabase) -> Dict:
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for texts using OpenAI API
+        
+        Args:
+            texts: List of text strings to embed
+            
+        Returns:
+            List of embedding vectors
+        """
+        try:
+            embeddings = run_sync(self._generate_embeddings_async(texts))
+            print(f"Generated {len(embeddings)} embeddings")
+            return embeddings
+            
+        except Exception as e:
+            print(f"ERROR: Error generating embeddings: {e}")
+            raise
+    
+    async def _generate_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, embedding repeated texts (headers, footers, boilerplate) only once"""
+        unique_texts = list(dict.fromkeys(texts))
+        if len(unique_texts) == len(texts):
+            return await self._generate_unique_embeddings_async(texts)
+        
+        embeddings_by_text = dict(zip(unique_texts, await self._generate_unique_embeddings_async(unique_texts)))
+        return [embeddings_by_text[text] for text in texts]
+    
+    async def _generate_unique_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Embed distinct texts, reusing cached embeddings and only sending cache misses to the API"""
+        if self.embedding_cache is None:
+            return await self._embed_texts(texts)
+        
+        keys = [EmbeddingCache.make_key(text, self.embedding_model_name, self.embedding_dim) for text in texts]
+        cached = self.embedding_cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        
+        if missing:
+            new_embeddings = await self._embed_texts([texts[i] for i in missing])
+            fresh = {keys[i]: embedding for i, embedding in zip(missing, new_embeddings)}
+            self.embedding_cache.put_many(fresh)
+            cached.update(fresh)
+        
+        return [cached[key] for key in keys]
+    
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches, keeping up to EMBEDDING_CONCURRENCY requests in flight"""
+        if self.encoder is not None:
+            # Run the local model off the event loop so other pipeline stages keep going
+            embeddings = await asyncio.to_thread(
+                self.encoder.encode, texts,
+                batch_size=64, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=True
+            )
+            return embeddings.tolist()
+        
+        # OpenAI API has a limit on batch size, so we process in batches
+        batch_size = 100  # Adjust based on OpenAI limits
+        sem = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        
+        with tqdm(total=len(texts), desc="Generating embeddings") as progress:
+            tasks = [
+                self._embed_batch(texts[i:i + batch_size], sem, progress)
+                for i in range(0, len(texts), batch_size)
+            ]
+            # gather preserves task order, so embeddings line up with texts
+            responses = await asyncio.gather(*tasks)
+        
+        return [data.embedding for response in responses for data in response.data]
+    
+    @retry(
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(6),
+        reraise=True,
+    )
+    async def _embed_batch(self, batch: List[str], sem: asyncio.Semaphore, progress: tqdm):
+        """Embed one batch of texts, retrying transient API errors with exponential backoff"""
+        async with sem:
+            response = await self.aclient.embeddings.create(
+                model=self.embedding_model_name,
+                input=batch,
+                **self.embedding_params
+            )
+        progress.update(len(batch))
+        return response
+    
+    def process_directory(self, input_dir: str, db: FactCheckDatabase, mode: str = "sync") -> Dict:
         """
         Process all supported documents in a directory
         
         Args:
-            input_dir: Directory containing documents
+            input_dir: Directory containing documents (searched recursively)
             db: Database instance to store processed chunks
+            mode: "sync" extracts, embeds and stores files concurrently; "batch" collects every chunk
+                  and embeds them through the OpenAI Batch API (half the cost, but can take
+                  up to 24 hours)
             
         Returns:
             Processing statistics
         """
+        if mode not in ("sync", "batch"):
+            raise ValueError(f"Unknown processing mode: {mode}")
+        if mode == "batch" and self.encoder is not None:
+            raise ValueError("Batch mode requires an OpenAI embedding model")
+        
         input_dir = Path(input_dir)
         
         if not input_dir.exists():
             print(f"ERROR: Directory not found: {input_dir}")
             return {"error": "Directory not found"}
         
-        # Find all supported files
-        files_to_process = []
-        for ext in self.supported_formats:
-            files_to_process.extend(input_dir.glob(f"*{ext}"))
+        # Find all supported files, including subdirectories, in a single walk
+        files_to_process = [
+            path for path in input_dir.rglob('*')
+            if path.suffix.lower() in self.supported_formats and path.is_file()
+        ]
         
         if not files_to_process:
             print(f"WARNING: No supported files found in {input_dir}")
@@ -292,25 +538,25 @@ class DocumentProcessor:
         
         start_time = datetime.now()
         
-        # Process each file
-        for file_path in tqdm(files_to_process, desc="Processing documents"):
-            try:
-                chunks, metadata_list, ids = self.process_document(file_path)
-                
-                if chunks:
-                    # Generate embeddings for chunks
-                    embeddings = self.generate_embeddings(chunks)
-                    
-                    # Add to database with embeddings
-                    db.add_document_chunks(chunks, metadata_list, ids, embeddings)
-                    stats["total_chunks"] += len(chunks)
-                    stats["processed_files"] += 1
-                else:
-                    stats["failed_files"].append(str(file_path))
-                    
-            except Exception as e:
-                print(f"ERROR: Failed to process {file_path}: {e}")
-                stats["failed_files"].append(str(file_path))
+        if mode == "batch":
+            documents = self._embed_files_batch(files_to_process, stats)
+            
+            # Store every embedded chunk in one bulk insert
+            if documents:
+                try:
+                    db.add_document_chunks_bulk(
+                        [chunk for _, chunks, _, _, _ in documents for chunk in chunks],
+                        [metadata for _, _, metadata_list, _, _ in documents for metadata in metadata_list],
+                        [chunk_id for _, _, _, ids, _ in documents for chunk_id in ids],
+                        [embedding for _, _, _, _, embeddings in documents for embedding in embeddings]
+                    )
+                    stats["total_chunks"] += sum(len(chunks) for _, chunks, _, _, _ in documents)
+                    stats["processed_files"] += len(documents)
+                except Exception as e:
+                    print(f"ERROR: Failed to store processed documents: {e}")
+                    stats["failed_files"].extend(str(file_path) for file_path, _, _, _, _ in documents)
+        else:
+            run_sync(self._process_files_pipeline(files_to_process, db, stats))
         
         end_time = datetime.now()
         stats["processing_time"] = str(end_time - start_time)
@@ -326,7 +572,229 @@ class DocumentProcessor:
                 print(f"   - {failed_file}")
         
         return stats
-
+    
+    def _chunk_files(self, files_to_process: List[Path], stats: Dict) -> List[Tuple]:
+        """
+        Extract, clean and chunk files in parallel worker processes
+        
+        Returns:
+            List of (file_path, chunks, metadata_list, ids) for each file that produced chunks
+        """
+        chunked = []
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = [executor.submit(_extract_clean_chunk, file_path) for file_path in files_to_process]
+            
+            for file_path, future in tqdm(zip(files_to_process, futures), total=len(futures), desc="Chunking documents"):
+                try:
+                    chunks, metadata_list, ids = future.result()
+                    if chunks:
+                        chunked.append((file_path, chunks, metadata_list, ids))
+                    else:
+                        stats["failed_files"].append(str(file_path))
+                except Exception as e:
+                    print(f"ERROR: Failed to process {file_path}: {e}")
+                    stats["failed_files"].append(str(file_path))
+        
+        return chunked
+    
+    async def _process_files_pipeline(self, files_to_process: List[Path], db: FactCheckDatabase, stats: Dict):
+        """
+        Run extraction, embedding and database insertion as concurrent stages
+        
+        Files are chunked in worker processes, embedded through the async OpenAI client and
+        written to the database as soon as each stage finishes, with bounded queues between
+        stages so a slow stage holds back the others instead of buffering whole directories.
+        """
+        loop = asyncio.get_running_loop()
+        extract_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        insert_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        workers = os.cpu_count() or 1
+        progress = tqdm(total=len(files_to_process), desc="Processing documents")
+        
+        def fail(file_path: Path, error: Optional[Exception] = None):
+            if error is not None:
+                print(f"ERROR: Failed to process {file_path}: {error}")
+            stats["failed_files"].append(str(file_path))
+            progress.update(1)
+        
+        async def extract(executor: ProcessPoolExecutor):
+            async def forward(file_path: Path, future):
+                try:
+                    chunks, metadata_list, ids = await future
+                except Exception as e:
+                    fail(file_path, e)
+                    return
+                if chunks:
+                    await extract_q.put((file_path, chunks, metadata_list, ids))
+                else:
+                    fail(file_path)
+            
+            # Keep one file per worker in flight, handing results on in directory order
+            pending = deque()
+            for file_path in files_to_process:
+                pending.append((file_path, loop.run_in_executor(executor, _extract_clean_chunk, file_path)))
+                if len(pending) >= workers:
+                    await forward(*pending.popleft())
+            while pending:
+                await forward(*pending.popleft())
+            await extract_q.put(None)
+        
+        async def embed():
+            while (item := await extract_q.get()) is not None:
+                file_path, chunks, metadata_list, ids = item
+                try:
+                    embeddings = await self._generate_embeddings_async(chunks)
+                except Exception as e:
+                    fail(file_path, e)
+                    continue
+                await insert_q.put((file_path, chunks, metadata_list, ids, embeddings))
+            await insert_q.put(None)
+        
+        async def insert():
+            while (item := await insert_q.get()) is not None:
+                file_path, chunks, metadata_list, ids, embeddings = item
+                try:
+                    # Chroma is synchronous; keep the event loop free while it writes
+                    await asyncio.to_thread(db.add_document_chunks_bulk, chunks, metadata_list, ids, embeddings)
+                except Exception as e:
+                    fail(file_path, e)
+                    continue
+                stats["total_chunks"] += len(chunks)
+                stats["processed_files"] += 1
+                progress.update(1)
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                await asyncio.gather(extract(executor), embed(), insert())
+        finally:
+            progress.close()
+    
+    def _embed_files_batch(self, files_to_process: List[Path], stats: Dict) -> List[Tuple]:
+        """
+        Chunk every file, then embed all chunks in Batch API jobs
+        
+        Returns:
+            List of (file_path, chunks, metadata_list, ids, embeddings) for each embedded file
+        """
+        chunked = self._chunk_files(files_to_process, stats)
+        
+        if not chunked:
+            return []
+        
+        all_chunks = [chunk for _, chunks, _, _ in chunked for chunk in chunks]
+        all_ids = [chunk_id for _, _, _, ids in chunked for chunk_id in ids]
+        
+        try:
+            embeddings_by_id = self.generate_embeddings_batch(all_chunks, all_ids)
+        except Exception as e:
+            print(f"ERROR: Batch embedding failed: {e}")
+            stats["failed_files"].extend(str(file_path) for file_path, _, _, _ in chunked)
+            return []
+        
+        documents = []
+        for file_path, chunks, metadata_list, ids in chunked:
+            if any(chunk_id not in embeddings_by_id for chunk_id in ids):
+                print(f"ERROR: Missing embeddings for {file_path}")
+                stats["failed_files"].append(str(file_path))
+                continue
+            
+            embeddings = [embeddings_by_id[chunk_id] for chunk_id in ids]
+            documents.append((file_path, chunks, metadata_list, ids, embeddings))
+        
+        return documents
+    
+    def generate_embeddings_batch(self, texts: List[str], ids: List[str], poll_interval: float = 30.0) -> Dict[str, List[float]]:
+        """
+        Generate embeddings through the OpenAI Batch API
+        
+        Args:
+            texts: List of text strings to embed
+            ids: Unique ID for each text, used as the request's custom_id
+            poll_interval: Seconds between batch status checks
+            
+        Returns:
+            Mapping of ID to embedding vector (failed requests are left out)
+        """
+        # Submit each distinct text once, under the ID of its first occurrence
+        first_ids = {}
+        for chunk_id, text in zip(ids, texts):
+            first_ids.setdefault(text, chunk_id)
+        
+        if len(first_ids) < len(texts):
+            print(f"Embedding {len(first_ids)} distinct texts out of {len(texts)}")
+            embeddings_by_first_id = self._generate_unique_embeddings_batch(list(first_ids), list(first_ids.values()), poll_interval)
+            return {
+                chunk_id: embeddings_by_first_id[first_ids[text]]
+                for chunk_id, text in zip(ids, texts) if first_ids[text] in embeddings_by_first_id
+            }
+        
+        return self._generate_unique_embeddings_batch(texts, ids, poll_interval)
+    
+    def _generate_unique_embeddings_batch(self, texts: List[str], ids: List[str], poll_interval: float) -> Dict[str, List[float]]:
+        """Embed distinct texts through Batch API jobs, skipping cached ones"""
+        embeddings_by_id = {}
+        
+        if self.embedding_cache is not None:
+            keys_by_id = {chunk_id: EmbeddingCache.make_key(text, self.embedding_model_name, self.embedding_dim) for chunk_id, text in zip(ids, texts)}
+            cached = self.embedding_cache.get_many(list(keys_by_id.values()))
+            embeddings_by_id = {chunk_id: cached[key] for chunk_id, key in keys_by_id.items() if key in cached}
+            if embeddings_by_id:
+                print(f"Reusing {len(embeddings_by_id)} cached embeddings")
+                uncached = [(chunk_id, text) for chunk_id, text in zip(ids, texts) if chunk_id not in embeddings_by_id]
+                ids = [chunk_id for chunk_id, _ in uncached]
+                texts = [text for _, text in uncached]
+        
+        for start in range(0, len(texts), BATCH_API_MAX_REQUESTS):
+            batch_texts = texts[start:start + BATCH_API_MAX_REQUESTS]
+            batch_ids = ids[start:start + BATCH_API_MAX_REQUESTS]
+            
+            requests_jsonl = "\n".join(
+                json.dumps({
+                    "custom_id": chunk_id,
+                    "method": "POST",
+                    "url": "/v1/embeddings",
+                    "body": {"model": self.embedding_model_name, "input": text, **self.embedding_params}
+                })
+                for chunk_id, text in zip(batch_ids, batch_texts)
+            )
+            
+            input_file = self.client.files.create(
+                file=("embedding_requests.jsonl", requests_jsonl.encode("utf-8")),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/embeddings",
+                completion_window="24h"
+            )
+            print(f"Submitted embedding batch {batch.id} with {len(batch_texts)} requests")
+            
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+                print(f"  Batch {batch.id}: {batch.status}")
+            
+            # Expired batches still return the results that finished in time
+            if batch.status not in ("completed", "expired") or not batch.output_file_id:
+                raise RuntimeError(f"Embedding batch {batch.id} ended with status {batch.status}")
+            
+            output = self.client.files.content(batch.output_file_id).text
+            for line in output.splitlines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") == 200:
+                    embeddings_by_id[result["custom_id"]] = response["body"]["data"][0]["embedding"]
+            
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many({
+                    keys_by_id[chunk_id]: embeddings_by_id[chunk_id]
+                    for chunk_id in batch_ids if chunk_id in embeddings_by_id
+                })
+        
+        print(f"Generated {len(embeddings_by_id)} embeddings")
+        return embeddings_by_id
 
 def main():
     """Main function to run document processing"""
@@ -337,10 +805,18 @@ def main():
                        help="Directory containing documents to process")
     parser.add_argument("--db_path", default="./data/chroma_db", 
                        help="Path to ChromaDB database")
-    parser.add_argument("--embedding_model", default="all-MiniLM-L6-v2",
-                       help="Sentence transformer model to use")
+    parser.add_argument("--embedding_model", default="text-embedding-3-small",
+                       help="OpenAI embedding model (text-embedding-*), or a local sentence-transformers "
+                            "model such as all-MiniLM-L6-v2 (the API embeds queries with OpenAI, so only "
+                            "use a local model for a database queried the same way)")
+    parser.add_argument("--chroma_host", default=None,
+                       help="ChromaDB server host (uses the local database at --db_path if not set)")
+    parser.add_argument("--chroma_port", type=int, default=8000,
+                       help="ChromaDB server port")
     parser.add_argument("--clear_db", action="store_true",
                        help="Clear existing database before processing")
+    parser.add_argument("--mode", choices=["sync", "batch"], default="sync",
+                       help="Embed files as they are processed, or all at once through the OpenAI Batch API")
     
     args = parser.parse_args()
     
@@ -349,18 +825,22 @@ def main():
     print(f"Database path: {args.db_path}")
     print(f"🤖 Embedding model: {args.embedding_model}")
     
-    # Initialize database
-    db = FactCheckDatabase(args.db_path)
+    # Initialize database (local models produce their native embedding size)
+    embedding_dim = DEFAULT_EMBEDDING_DIM if args.embedding_model.startswith("text-embedding-") else None
+    if args.chroma_host:
+        db = FactCheckDatabase(mode="http", host=args.chroma_host, port=args.chroma_port, embedding_dim=embedding_dim)
+    else:
+        db = FactCheckDatabase(args.db_path, embedding_dim=embedding_dim)
     
     if args.clear_db:
         print("Clearing existing database...")
         db.clear_collection()
     
     # Initialize processor
-    processor = DocumentProcessor(args.embedding_model)
+    processor = DocumentProcessor(embedding_model=args.embedding_model, embedding_dim=db.embedding_dim)
     
     # Process documents
-    stats = processor.process_directory(args.input_dir, db)
+    stats = processor.process_directory(args.input_dir, db, mode=args.mode)
     
     # Show final database stats
     db_stats = db.get_collection_stats()
@@ -0,0 +1,89 @@
+"""
+Persistent embedding cache so unchanged chunks are not re-embedded across runs
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Keys per SELECT, kept below SQLite's bound-parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str = "./data/embedding_cache.db"):
+        """
+        Open (or create) a SQLite-backed embedding cache
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # WAL lets several API workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: Optional[int] = None) -> bytes:
+        """
+        Build the cache key for a text embedded with a given model
+
+        Args:
+            text: Text that was embedded
+            model: Embedding model name
+            dimensions: Requested embedding size (None for the model's native size)
+
+        Returns:
+            16-byte BLAKE2b digest of the model name, size and text
+        """
+        return hashlib.blake2b(f"{model}:{dimensions or ''}\0{text}".encode(), digest_size=16).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """
+        Look up cached embeddings
+
+        Args:
+            keys: Cache keys from make_key
+
+        Returns:
+            Mapping of key to embedding for the keys that are cached
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch
+                ).fetchall()
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32).tolist()
+
+        return found
+
+    def put_many(self, embeddings: Dict[bytes, List[float]]):
+        """
+        Store embeddings in the cache
+
+        Args:
+            embeddings: Mapping of cache key to embedding vector
+        """
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in embeddings.items()
+        ]
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)", rows)
+            self._conn.commit()
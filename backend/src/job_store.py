@@ -0,0 +1,120 @@
+"""
+Upload job state shared by every API worker process
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+# Jobs still pending/running after this long are assumed to belong to a dead worker
+# and no longer block re-uploading the same file
+STALE_JOB_SECONDS = 3600
+
+
+class JobStore:
+    def __init__(self, db_path: str = "./data/jobs.db"):
+        """
+        Open (or create) a SQLite-backed job table
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process's connection, opening a new one after a fork"""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            # WAL lets every worker read job state while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, filename TEXT NOT NULL, status TEXT NOT NULL, "
+                "touched REAL NOT NULL, data BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_filename ON jobs (filename, status)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def create(self, job: dict) -> bool:
+        """
+        Record a new job unless the same file is already being processed
+
+        Args:
+            job: Job record with at least job_id, filename and status
+
+        Returns:
+            False if another worker has a pending or running job for the file
+        """
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front so two workers can't both pass the check
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                in_progress = conn.execute(
+                    "SELECT 1 FROM jobs WHERE filename = ? AND status IN ('pending', 'running') AND touched > ?",
+                    (job["filename"], time.time() - STALE_JOB_SECONDS)
+                ).fetchone()
+                if in_progress:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT INTO jobs (job_id, filename, status, touched, data) VALUES (?, ?, ?, ?, ?)",
+                    (job["job_id"], job["filename"], job["status"], time.time(), orjson.dumps(job))
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def update(self, job_id: str, **fields):
+        """
+        Merge fields into a recorded job
+
+        Args:
+            job_id: ID of the job to update
+            **fields: Fields to set on the job record
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return
+                job = orjson.loads(row[0])
+                job.update(fields)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, touched = ?, data = ? WHERE job_id = ?",
+                    (job["status"], time.time(), orjson.dumps(job), job_id)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Look up a job
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            The job record, or None if it is unknown
+        """
+        with self._lock:
+            row = self._connection().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return orjson.loads(row[0]) if row else None
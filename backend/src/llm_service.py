@@ -3,165 +3,861 @@ LLM service for generating fact-checking responses
 Uses OpenAI GPT models to analyze retrieved context and provide fact-checking responses
 """
 
+import asyncio
+import atexit
 import os
-import openai
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any, Tuple, AsyncIterator
 import logging
-import json
-from models import FactCheckResponse, LLMResponseWrapper, TokenUsage, SourceReference, FactCheckClassification
+import orjson
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import tiktoken
+from pydantic import ValidationError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+from async_utils import run_sync
+from models import ContextChunk, FactCheckResponse, LLMResponseWrapper, TokenUsage, FactCheckClassification
 
 logger = logging.getLogger(__name__)
 
+# Default fact-check model (override with LLM_MODEL)
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Models that support Structured Outputs (response_format json_schema with strict: true);
+# others fall back to JSON mode
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1")
+
+# Sampling temperature for fact-check generation (low for more consistent answers)
+TEMPERATURE = 0.2
+
+# Completion token budget per fact-check: a base plus a share per context chunk, within these bounds
+MIN_TOKENS = 300
+MAX_TOKENS = 1500
+TOKENS_PER_CHUNK = 50
+
+# Context window sizes by model prefix (longest prefix wins), for keeping max_tokens within the window
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4.1": 1047576,
+}
+DEFAULT_CONTEXT_WINDOW = 16385
+
+# Tokens kept free between the prompt and completion budget and the context window
+CONTEXT_WINDOW_MARGIN = 50
+
+# Context caps per prompt: characters kept from each chunk, and from all chunks together
+MAX_CHARS_PER_CHUNK = 2000
+MAX_TOTAL_CONTEXT_CHARS = 20000
+
+# Claims packed into one request by generate_batch_fact_check, and that request's completion budget
+BATCH_CLAIMS_PER_REQUEST = 8
+BATCH_MAX_TOKENS = 4096
+
+# Fact-check requests in flight at once in generate_many
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Seconds between status checks while waiting for a Batch API job
+BATCH_POLL_INTERVAL = 30
+
+# Batch API job states after which the job will not change again
+BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Default OpenAI rate limits; override with LLM_RPM / LLM_TPM to match your account tier
+DEFAULT_REQUESTS_PER_MINUTE = 3500
+DEFAULT_TOKENS_PER_MINUTE = 90000
+
+# Bump whenever the prompts below change, so cached responses to the old prompts are not reused
+PROMPT_VERSION = "v2"
+
+SYSTEM_MESSAGE = "You are a careful, professional fact-checker. Respond with valid JSON."
+
+FACT_CHECK_HEADER = """Fact-check the query against the retrieved context.
+
+USER QUERY: "{query}"
+
+RETRIEVED CONTEXT:
+"""
+
+# Classification rules shared by the single and batched fact-check prompts
+FACT_CHECK_INSTRUCTIONS = """RULES:
+- Classify as SUPPORTED, CONTRADICTED, INSUFFICIENT (too little evidence) or MIXED (evidence both supports and contradicts), using only the context
+- Non-factual queries (opinions, requests, questions): INSUFFICIENT, and say why
+- In analysis and reasoning, refer to sources by content (e.g. "the tax documentation"), never by number
+- Don't speculate beyond the evidence
+"""
+
+# Response format requested after the single-claim prompt's context; classification comes
+# first so streamed responses reveal the verdict early
+FACT_CHECK_FOOTER = "\n" + FACT_CHECK_INSTRUCTIONS + """
+Output JSON: {"classification": "...", "analysis": "...", "sources_used": [{"source_number": 1, "file_name": "..."}], "reasoning": "step by step"}
+"""
+
+BATCH_PROMPT_HEADER = """Fact-check each claim against the retrieved context.
+
+RETRIEVED CONTEXT:
+"""
+
+# Response format requested after the batched prompt's claims
+BATCH_FACT_CHECK_FOOTER = "\n" + FACT_CHECK_INSTRUCTIONS + """- Assess each claim independently, using only its relevant sources
+
+Output JSON with one result per claim: {"results": [{"claim_index": 0, "classification": "...", "analysis": "...", "sources_used": [{"source_number": 1, "file_name": "..."}], "reasoning": "step by step"}]}
+"""
+
+
+# Strict schema for one fact-check. Written out rather than generated from FactCheckResponse:
+# strict mode needs every property required and no extras, and document_url is filled in by us
+FACT_CHECK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "classification": {"type": "string", "enum": [c.value for c in FactCheckClassification]},
+        "analysis": {"type": "string"},
+        "sources_used": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source_number": {"type": "integer"},
+                    "file_name": {"type": "string"}
+                },
+                "required": ["source_number", "file_name"],
+                "additionalProperties": False
+            }
+        },
+        "reasoning": {"type": "string"}
+    },
+    "required": ["classification", "analysis", "sources_used", "reasoning"],
+    "additionalProperties": False
+}
+
+BATCH_FACT_CHECK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"claim_index": {"type": "integer"}, **FACT_CHECK_SCHEMA["properties"]},
+                "required": ["claim_index", *FACT_CHECK_SCHEMA["required"]],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["results"],
+    "additionalProperties": False
+}
+
+
+def _as_context_chunks(context_chunks: List[Any]) -> List[ContextChunk]:
+    """Validate context chunks once on entry (ContextChunk instances pass through unchanged)"""
+    return [ContextChunk.model_validate(chunk) for chunk in context_chunks]
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Check for transient OpenAI errors worth retrying (rate limits, dropped connections, 5xx)"""
+    # Deferred like the clients in LLMService.__init__, so importing this module does not load openai
+    import openai
+    return isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError))
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE):
+        """
+        Token-bucket throttle for OpenAI request and token rate limits
+
+        Requests wait here until both buckets have room, so bursts are spread out
+        instead of tripping 429s and backing off.
+
+        Args:
+            requests_per_minute: Request budget per minute
+            tokens_per_minute: Token budget per minute
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """Top up both buckets for the time elapsed since the last refill"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        self._available_requests = min(
+            self.requests_per_minute, self._available_requests + elapsed * self.requests_per_minute / 60
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute, self._available_tokens + elapsed * self.tokens_per_minute / 60
+        )
+
+    async def acquire(self, tokens: int):
+        """
+        Wait until one request and the given number of tokens are available, then take them
+
+        Args:
+            tokens: Estimated tokens for the request (prompt plus completion budget)
+        """
+        # A request larger than the whole budget would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+
+        # Waiters queue on the lock, so capacity is handed out in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+
+                wait = max(
+                    (1 - self._available_requests) * 60 / self.requests_per_minute,
+                    (tokens - self._available_tokens) * 60 / self.tokens_per_minute,
+                    0
+                )
+                await asyncio.sleep(wait)
+
+
+@lru_cache(maxsize=None)
+def _get_model_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+    """Load a model's tokenizer once per process (None if it can't be loaded, e.g. offline on first use)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning("Could not load tokenizer for %s, estimating tokens from length: %s", model, e)
+        return None
+
+
+class IncrementalJSONObjectParser:
+    def __init__(self):
+        """
+        Parse a JSON object as it streams in, returning each top-level member once it is complete
+
+        Lets callers act on early fields (e.g. the classification) while later ones are still generating.
+        """
+        self.buffer = ""
+        self.complete = False
+
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        """
+        Add streamed text and return the top-level members it completed
+
+        Args:
+            text: Next piece of the JSON document
+
+        Returns:
+            Mapping of newly completed keys to their parsed values
+        """
+        self.buffer += text
+        completed = {}
+
+        for i in range(self._pos, len(self.buffer)):
+            char = self.buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = i + 1
+            elif char in '}],':
+                # A comma or the closing brace at the top level ends a member
+                if self._depth == 1 and self._member_start is not None:
+                    member = self.buffer[self._member_start:i].strip()
+                    if member:
+                        completed.update(orjson.loads("{" + member + "}"))
+                    self._member_start = i + 1
+                if char != ',':
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self.complete = True
+
+        self._pos = len(self.buffer)
+        return completed
+
+
+# Seconds a changed persistent LLM cache waits before it is written to disk, so bursts of
+# inserts share one file write instead of each rewriting it
+CACHE_FLUSH_INTERVAL = 30
+
+
+class LLMCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 24 * 3600, path: Optional[str] = None):
+        """
+        Exact-match cache of LLM responses with LRU eviction and expiry
+
+        Args:
+            max_size: Maximum number of cached responses
+            ttl_seconds: Seconds a cached response stays valid
+            path: Optional JSON file to persist the cache across restarts (written at most every
+                CACHE_FLUSH_INTERVAL seconds and at exit)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = Path(path) if path else None
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+
+        if self.path:
+            if self.path.exists():
+                self._load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(model: str, temperature: float, query: str, context_chunks: List[ContextChunk]) -> str:
+        """
+        Build the cache key for a fact-check request
+
+        Args:
+            model: LLM model name
+            temperature: Sampling temperature
+            query: User's fact-checking query
+            context_chunks: Retrieved context chunks
+
+        Returns:
+            SHA-256 hex digest of the prompt version, model, temperature, query and sorted context texts
+        """
+        payload = {
+            "v": PROMPT_VERSION,
+            "m": model,
+            "t": temperature,
+            "q": query,
+            "c": sorted(chunk.text for chunk in context_chunks)
+        }
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Cached response data, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry["response"]
+
+    def set(self, key: str, response: Dict[str, Any]):
+        """
+        Store a response in the cache
+
+        Args:
+            key: Cache key from make_key
+            response: Response data (e.g. LLMResponseWrapper.model_dump())
+        """
+        with self._lock:
+            self._entries[key] = {
+                "input_hash": key,
+                "response": response,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            if self.path:
+                self._dirty = True
+                # Threads don't survive a fork, so a timer inherited from the parent reads as not alive
+                if self._flush_timer is None or not self._flush_timer.is_alive():
+                    self._flush_timer = threading.Timer(CACHE_FLUSH_INTERVAL, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+
+    def flush(self):
+        """Write pending changes to the cache file, if it is persisted and has changed"""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            entries = list(self._entries.values())
+            self._dirty = False
+
+        # Serialize and write outside the entry lock so lookups and inserts aren't blocked on disk I/O
+        with self._save_lock:
+            self._save(entries)
+
+    def _load(self):
+        """Load unexpired entries from the cache file"""
+        try:
+            with open(self.path, 'rb') as f:
+                entries = orjson.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load LLM cache from %s: %s", self.path, e)
+            return
+
+        now = time.time()
+        for entry in entries[-self.max_size:]:
+            if entry.get("expires_at", 0) > now:
+                self._entries[entry["input_hash"]] = entry
+
+    def _save(self, entries: List[Dict[str, Any]]):
+        """Write a snapshot of the cache entries to its file atomically"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(entries))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save LLM cache to %s: %s", self.path, e)
+
+
+# Tokens that flip or pin down a claim while barely moving its embedding
+# ("X is safe" / "X is not safe", "rose 5%" / "rose 50%")
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|none|nobody|nothing|neither|nor|without|cannot)\b|n't\b")
+
+
+class SemanticCache:
+    def __init__(self, max_size: int = 1024, similarity_threshold: float = 0.95, ttl_seconds: float = 24 * 3600):
+        """
+        Cache of LLM responses looked up by query embedding similarity
+
+        Paraphrases of an earlier query ("Is the Earth round?" / "Is our planet spherical?")
+        reuse its answer, but only when the same context was retrieved for both and the
+        queries contain the same numbers and negations. Near-identical claims can still have
+        opposite verdicts, so LLMService only uses this cache when it is opted into.
+
+        Args:
+            max_size: Maximum number of cached responses (oldest are overwritten first)
+            similarity_threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Seconds a cached response stays valid
+        """
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+
+        # Ring buffer of unit-length query embeddings, allocated on the first insert
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_size
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_context_hash(context_chunks: List[ContextChunk]) -> str:
+        """
+        Hash the retrieved context so answers are only reused for the same sources
+
+        Args:
+            context_chunks: Retrieved context chunks
+
+        Returns:
+            SHA-256 hex digest of the sorted context texts
+        """
+        texts = sorted(chunk.text for chunk in context_chunks)
+        return hashlib.sha256(orjson.dumps(texts)).hexdigest()
+
+    @staticmethod
+    def make_query_signature(query: str) -> Tuple[str, ...]:
+        """
+        Extract the numbers and negation words of a query, which must match for a hit
+
+        Args:
+            query: Query text
+
+        Returns:
+            Numbers and negation tokens in order of appearance
+        """
+        query = query.lower().replace("\u2019", "'")
+        return tuple(_NUMBER_PATTERN.findall(query)) + tuple(_NEGATION_PATTERN.findall(query))
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        """Convert an embedding to a unit-length float32 vector (None if it is all zeros)"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, query: str, query_embedding, context_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for a similar query with the same context
+
+        Args:
+            query: Incoming query text
+            query_embedding: Embedding of the incoming query
+            context_hash: Hash of the retrieved context from make_context_hash
+
+        Returns:
+            Cached response data, or None if no similar unexpired entry matches
+        """
+        vector = self._normalize(query_embedding)
+        if vector is None:
+            return None
+        signature = self.make_query_signature(query)
+
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                return None
+
+            sims = self._matrix[:self._size] @ vector
+            now = time.time()
+            # Best match first; a closer paraphrase may have been answered from different sources
+            for idx in np.argsort(sims)[::-1]:
+                if sims[idx] < self.similarity_threshold:
+                    break
+                entry = self._entries[idx]
+                if (entry["context_hash"] == context_hash and entry["signature"] == signature
+                        and entry["expires_at"] > now):
+                    return entry["response"]
+        return None
+
+    def set(self, query: str, query_embedding, context_hash: str, response: Dict[str, Any]):
+        """
+        Store a response under its query embedding
+
+        Args:
+            query: Query text
+            query_embedding: Embedding of the query
+            context_hash: Hash of the retrieved context from make_context_hash
+            response: Response data (e.g. LLMResponseWrapper.model_dump())
+        """
+        vector = self._normalize(query_embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                # First insert, or the embedding model changed: start over
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_size
+                self._size = 0
+                self._next = 0
+
+            self._matrix[self._next] = vector
+            self._entries[self._next] = {
+                "context_hash": context_hash,
+                "signature": self.make_query_signature(query),
+                "response": response,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._next = (self._next + 1) % self.max_size
+            self._size = min(self._size + 1, self.max_size)
+
+    def clear(self):
+        """Drop all entries, e.g. after documents are re-ingested"""
+        with self._lock:
+            self._matrix = None
+            self._entries = [None] * self.max_size
+            self._size = 0
+            self._next = 0
+
+
+_default_cache: Optional[LLMCache] = None
+_default_semantic_cache: Optional[SemanticCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMCache:
+    """
+    Return the process-wide LLM response cache shared by all LLMService instances
+
+    Set LLM_CACHE_PATH (e.g. .cache/llm_responses.json) to persist it across restarts.
+
+    Returns:
+        Shared LLMCache
+    """
+    global _default_cache
+
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache(path=os.getenv('LLM_CACHE_PATH') or None)
+    return _default_cache
+
+
+def get_default_semantic_cache() -> SemanticCache:
+    """
+    Return the process-wide semantic response cache shared by all LLMService instances
+
+    Returns:
+        Shared SemanticCache
+    """
+    global _default_semantic_cache
+
+    if _default_semantic_cache is None:
+        with _default_cache_lock:
+            if _default_semantic_cache is None:
+                _default_semantic_cache = SemanticCache()
+    return _default_semantic_cache
+
+
 class LLMService:
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, cache: Optional[LLMCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 max_chars_per_chunk: int = MAX_CHARS_PER_CHUNK, max_total_context_chars: int = MAX_TOTAL_CONTEXT_CHARS):
         """
         Initialize LLM service with OpenAI configuration
         
         Args:
             api_key: OpenAI API key (if None, reads from environment)
-            model: OpenAI model to use for generation
+            model: OpenAI model to use for generation (defaults to LLM_MODEL, then gpt-4o-mini)
+            cache: Response cache (defaults to the shared process-wide cache)
+            semantic_cache: Similar-query response cache (defaults to the shared process-wide cache
+                when LLM_SEMANTIC_CACHE is enabled, otherwise no semantic caching)
+            rate_limiter: Request/token throttle (defaults to LLM_RPM / LLM_TPM or 3500 / 90000)
+            max_chars_per_chunk: Characters of each context chunk included in a prompt
+            max_total_context_chars: Characters of context included in a prompt overall
         """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        self.model = model
+        self.model = model = model or os.getenv('LLM_MODEL') or DEFAULT_MODEL
+        self.max_chars_per_chunk = max_chars_per_chunk
+        self.max_total_context_chars = max_total_context_chars
+        self.cache = cache if cache is not None else get_default_cache()
+        # Off by default: a near-duplicate query can deserve a different verdict
+        if semantic_cache is None and os.getenv('LLM_SEMANTIC_CACHE', 'false').lower() in ('1', 'true'):
+            semantic_cache = get_default_semantic_cache()
+        self.semantic_cache = semantic_cache
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute=float(os.getenv('LLM_RPM', DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=float(os.getenv('LLM_TPM', DEFAULT_TOKENS_PER_MINUTE))
+        )
         
         if not self.api_key:
             raise ValueError("OpenAI API key not provided. Set OPENAI_API_KEY environment variable or pass api_key parameter")
         
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # Structured Outputs guarantee schema-valid JSON; older models only get JSON mode
+        if model.startswith(STRUCTURED_OUTPUT_MODELS):
+            self.response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "fact_check", "strict": True, "schema": FACT_CHECK_SCHEMA}
+            }
+            self.batch_response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "fact_check_batch", "strict": True, "schema": BATCH_FACT_CHECK_SCHEMA}
+            }
+        else:
+            self.response_format = self.batch_response_format = {"type": "json_object"}
+        
+        # Tokenizer and context window for prompt sizing (the tokenizer is shared per model)
+        self._encoding = _get_model_encoding(model)
+        matching_prefixes = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+        self.context_window = (MODEL_CONTEXT_WINDOWS[max(matching_prefixes, key=len)]
+                               if matching_prefixes else DEFAULT_CONTEXT_WINDOW)
+        
+        # Items of Batch API jobs submitted by this instance, for matching results back to their context
+        self._batch_items: Dict[str, List[Tuple[str, List[ContextChunk]]]] = {}
+        
+        # Shared per-key OpenAI clients on the process-wide connection pools (the async one runs on the shared event loop).
+        # Imported here so importing this module doesn't load the openai package
+        from openai_clients import get_async_openai_client, get_openai_client
+        self.client = get_openai_client(self.api_key)
+        self.aclient = get_async_openai_client(self.api_key)
         
         logger.info(f"LLM Service initialized with model: {model}")
     
-    def create_fact_check_prompt(self, query: str, context_chunks: List[Dict]) -> str:
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens of a text for this service's model
+        
+        Args:
+            text: Text to count
+            
+        Returns:
+            Token count (estimated as characters / 4 if the tokenizer is unavailable)
+        """
+        if self._encoding is None:
+            return len(text) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
+    
+    def estimate_max_tokens(self, context_chunks: List[ContextChunk]) -> int:
+        """
+        Size the completion budget for a fact-check: claims with more sources get longer answers
+        
+        Args:
+            context_chunks: Context chunks the claim is checked against
+            
+        Returns:
+            Completion token budget between MIN_TOKENS and MAX_TOKENS
+        """
+        return max(MIN_TOKENS, min(MIN_TOKENS + TOKENS_PER_CHUNK * len(context_chunks), MAX_TOKENS))
+    
+    def _fit_max_tokens(self, max_tokens: int, prompt_tokens: int) -> int:
+        """Shrink a completion budget so prompt plus completion fit in the model's context window"""
+        return max(1, min(max_tokens, self.context_window - prompt_tokens - CONTEXT_WINDOW_MARGIN))
+    
+    def _select_context(self, context_chunks: List[ContextChunk]) -> List[Tuple[int, ContextChunk]]:
+        """
+        Pick the context that goes into a prompt: most relevant first, without duplicates, within the character caps
+        
+        Models attend most to early context, so the highest-confidence chunks lead the prompt.
+        Each chunk keeps its 1-based position in context_chunks as its source number, so cited
+        sources still line up with the context returned to clients after reordering and dropping.
+        
+        Args:
+            context_chunks: Retrieved context chunks
+            
+        Returns:
+            (source number, chunk) pairs for distinct chunks sorted by descending confidence,
+            with text truncated to fit the caps
+        """
+        selected = []
+        seen = set()
+        remaining = self.max_total_context_chars
+        truncated = 0
+        duplicates = 0
+        
+        ranked = sorted(enumerate(context_chunks, 1), key=lambda item: item[1].confidence, reverse=True)
+        for number, chunk in ranked:
+            if remaining <= 0:
+                break
+            
+            text = chunk.text
+            
+            # The same passage can be retrieved more than once (e.g. a re-uploaded file)
+            key = (chunk.source_file, text[:200])
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            
+            limit = min(self.max_chars_per_chunk, remaining)
+            if len(text) > limit:
+                text = text[:limit]
+                chunk = chunk.model_copy(update={'text': text})
+                truncated += 1
+            
+            selected.append((number, chunk))
+            remaining -= len(text)
+        
+        if truncated or len(selected) < len(context_chunks):
+            logger.debug("Context capped: %d chunks truncated, %d duplicates and %d over budget dropped",
+                         truncated, duplicates, len(context_chunks) - len(selected) - duplicates)
+        
+        return selected
+    
+    def create_fact_check_prompt(self, query: str, context_chunks: List[ContextChunk]) -> str:
         """
         Create a fact-checking prompt using the query and retrieved context
         
         Args:
             query: User's fact-checking query
-            context_chunks: List of relevant document chunks with metadata
+            context_chunks: List of relevant document chunks with metadata (capped by _select_context)
             
         Returns:
             Formatted prompt for the LLM
         """
-        prompt = f"""You are a fact-checking assistant. Your task is to analyze the provided context and give a factual assessment of the user's query.
-
-USER QUERY: "{query}"
-
-RETRIEVED CONTEXT:
-"""
+        parts = [FACT_CHECK_HEADER.format(query=query)]
+        parts.extend(
+            f"\n[Source {i}] (File: {chunk.source_file})\n{chunk.text}\n"
+            for i, chunk in self._select_context(context_chunks)
+        )
+        parts.append(FACT_CHECK_FOOTER)
         
-        for i, chunk in enumerate(context_chunks, 1):
-            source = chunk.get('source_file', 'unknown')
-            text = chunk.get('text', '')
-            
-            prompt += f"\n[Source {i}] (File: {source})\n{text}\n"
-        
-        prompt += """
-INSTRUCTIONS:
-1. Analyze the retrieved context carefully
-2. Determine if the context supports, contradicts, or is insufficient to verify the query
-3. Provide a clear fact-check response with one of these classifications:
-   - SUPPORTED: The query is supported by the evidence
-   - CONTRADICTED: The query is contradicted by the evidence  
-   - INSUFFICIENT: Not enough evidence to make a determination
-   - MIXED: Evidence both supports and contradicts aspects of the query
-
-4. If the query is not a factual statement suitable for fact-checking (e.g., opinions, requests, questions), classify it as INSUFFICIENT and explain why it's not fact-checkable
-5. In your reasoning, DO NOT refer to sources by number (like "Source 1" or "Source 3"). Instead, refer to them by their content or context (like "the tax documentation" or "official guidelines")
-6. Be precise and avoid speculation beyond what the evidence shows
-
-You must respond with a JSON object matching this exact structure:
-{
-  "classification": "SUPPORTED|CONTRADICTED|INSUFFICIENT|MIXED",
-  "analysis": "Your detailed analysis of the claim without source numbers",
-  "sources_used": [
-    {
-      "source_number": 1,
-      "file_name": "filename.txt"
-    }
-  ],
-  "reasoning": "Step-by-step reasoning process without mentioning source numbers"
-}
-"""
-        
-        return prompt
+        return "".join(parts)
     
-    def generate_fact_check_response(self, query: str, context_chunks: List[Dict]) -> LLMResponseWrapper:
+    def generate_fact_check_response(self, query: str, context_chunks: List[ContextChunk],
+                                     query_embedding: Optional[List[float]] = None) -> LLMResponseWrapper:
         """
         Generate a fact-checking response using LLM with structured output
         
         Args:
             query: User's fact-checking query
             context_chunks: List of relevant document chunks with metadata including document_url
+            query_embedding: Embedding of the query, used to reuse answers to paraphrased queries
             
         Returns:
             LLMResponseWrapper containing structured response
         """
+        return run_sync(self.agenerate_fact_check_response(query, context_chunks, query_embedding))
+    
+    async def agenerate_fact_check_response(self, query: str, context_chunks: List[ContextChunk],
+                                            query_embedding: Optional[List[float]] = None) -> LLMResponseWrapper:
+        """
+        Async version of generate_fact_check_response, to be awaited on the shared event loop
+        
+        Args:
+            query: User's fact-checking query
+            context_chunks: List of relevant document chunks with metadata including document_url
+            query_embedding: Embedding of the query, used to reuse answers to paraphrased queries
+            
+        Returns:
+            LLMResponseWrapper containing structured response
+        """
+        context_chunks = _as_context_chunks(context_chunks)
+        
         # Handle case where no context is found
         if not context_chunks:
-            no_context_response = FactCheckResponse(
-                classification=FactCheckClassification.INSUFFICIENT,
-                analysis="No relevant documents found to fact-check this query.",
-                sources_used=[],
-                reasoning="No context documents were retrieved from the database that match this query."
-            )
-            
-            return LLMResponseWrapper(
-                status="success",
-                fact_check=no_context_response,
-                model_used=self.model,
-                token_usage=TokenUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
-            )
+            return self._no_context_response()
+        
+        # Identical query and context: reuse the earlier answer instead of calling the API
+        cache_key = LLMCache.make_key(self.model, TEMPERATURE, query, context_chunks)
+        cached = self.cache.get(cache_key)
+        
+        # Paraphrased query with the same context: reuse the closest earlier answer
+        context_hash = None
+        if cached is None and query_embedding is not None and self.semantic_cache is not None:
+            context_hash = SemanticCache.make_context_hash(context_chunks)
+            cached = self.semantic_cache.get(query, query_embedding, context_hash)
+            if cached is not None and cached.get("model_used") != self.model:
+                cached = None
+        
+        if cached is not None:
+            return self._cached_response(cached)
         
         try:
             # Create the prompt
             prompt = self.create_fact_check_prompt(query, context_chunks)
+            prompt_tokens = self.count_tokens(SYSTEM_MESSAGE) + self.count_tokens(prompt)
             
-            # Generate response using OpenAI with JSON mode
-            response = self.client.chat.completions.create(
-                model=self.model,
+            # Generate response using OpenAI with Structured Outputs (or JSON mode on older models)
+            response = await self._create_completion(
                 messages=[
-                    {"role": "system", "content": "You are a professional fact-checker who analyzes evidence carefully and provides accurate assessments. Always respond with valid JSON."},
+                    {"role": "system", "content": SYSTEM_MESSAGE},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,  # Low temperature for more consistent fact-checking
-                max_tokens=1500,
-                response_format={"type": "json_object"}
+                temperature=TEMPERATURE,
+                max_tokens=self._fit_max_tokens(self.estimate_max_tokens(context_chunks), prompt_tokens),
+                prompt_tokens=prompt_tokens,
+                response_format=self.response_format
             )
             
             generated_text = response.choices[0].message.content
             
             # Parse and validate the JSON response
             try:
-                json_response = json.loads(generated_text)
-                
-                # Create source references with document URLs
-                # First, create a mapping from source file names to document URLs
-                source_file_to_url = {}
-                for chunk in context_chunks:
-                    if chunk.get('source_file') and chunk.get('document_url'):
-                        source_file_to_url[chunk.get('source_file')] = chunk.get('document_url')
-                
-                sources_used = []
-                for source_data in json_response.get('sources_used', []):
-                    source_file = source_data.get('file_name', 'unknown')
-                    document_url = source_file_to_url.get(source_file)
-                    
-                    sources_used.append(SourceReference(
-                        source_number=source_data.get('source_number', 1),
-                        file_name=source_file,
-                        document_url=document_url
-                    ))
+                json_response = orjson.loads(generated_text)
+                fact_check = self._parse_fact_check(json_response, context_chunks)
                 
-                # Create structured fact-check response
-                fact_check = FactCheckResponse(
-                    classification=FactCheckClassification(json_response.get('classification', 'INSUFFICIENT')),
-                    analysis=json_response.get('analysis', 'Analysis not provided'),
-                    sources_used=sources_used,
-                    reasoning=json_response.get('reasoning', 'Reasoning not provided')
-                )
-                
-                return LLMResponseWrapper(
+                wrapper = LLMResponseWrapper(
                     status="success",
                     fact_check=fact_check,
                     model_used=self.model,
@@ -171,8 +867,14 @@ You must respond with a JSON object matching this exact structure:
                         total_tokens=response.usage.total_tokens
                     )
                 )
+                response_data = wrapper.model_dump(mode='json')
+                self.cache.set(cache_key, response_data)
+                if context_hash is not None:
+                    self.semantic_cache.set(query, query_embedding, context_hash, response_data)
                 
-            except (json.JSONDecodeError, ValueError) as parse_error:
+                return wrapper
+                
+            except (orjson.JSONDecodeError, ValidationError, ValueError) as parse_error:
                 logger.warning(f"Failed to parse LLM JSON response: {parse_error}")
                 logger.warning(f"Raw response: {generated_text}")
                 
@@ -200,7 +902,547 @@ You must respond with a JSON object matching this exact structure:
                 fallback_response=self._create_fallback_response(context_chunks)
             )
     
-    def _create_fallback_response(self, context_chunks: List[Dict]) -> str:
+    def _no_context_response(self) -> LLMResponseWrapper:
+        """Build the INSUFFICIENT response returned when no context was retrieved"""
+        no_context_response = FactCheckResponse(
+            classification=FactCheckClassification.INSUFFICIENT,
+            analysis="No relevant documents found to fact-check this query.",
+            sources_used=[],
+            reasoning="No context documents were retrieved from the database that match this query."
+        )
+        
+        return LLMResponseWrapper(
+            status="success",
+            fact_check=no_context_response,
+            model_used=self.model,
+            token_usage=TokenUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        )
+    
+    @staticmethod
+    def _cached_response(cached: Dict[str, Any]) -> LLMResponseWrapper:
+        """Rebuild a cached response; no tokens were spent on it this time"""
+        wrapper = LLMResponseWrapper.model_validate(cached)
+        wrapper.token_usage = TokenUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        return wrapper
+    
+    def _parse_fact_check(self, json_response: Dict, context_chunks: List[ContextChunk]) -> FactCheckResponse:
+        """
+        Build a FactCheckResponse from the model's JSON output
+        
+        Args:
+            json_response: Parsed JSON object for one claim
+            context_chunks: Context chunks the claim was checked against (for document URLs)
+            
+        Returns:
+            Structured fact-check response
+            
+        Raises:
+            ValidationError: If the JSON does not describe a valid fact-check
+        """
+        # Create source references with document URLs
+        # First, create a mapping from source file names to document URLs (only if any sources were cited)
+        sources_data = json_response.get('sources_used') or []
+        source_file_to_url = {
+            chunk.source_file: chunk.document_url
+            for chunk in context_chunks
+            if chunk.source_file and chunk.document_url
+        } if sources_data else {}
+        
+        for source_data in sources_data:
+            if isinstance(source_data, dict):
+                source_data['document_url'] = source_file_to_url.get(source_data.get('file_name'))
+        
+        # Validate the whole response in one pass (classification, required fields, minimum lengths)
+        return FactCheckResponse.model_validate(json_response)
+    
+    def create_batch_fact_check_prompt(self, queries: List[str], context_chunks_per_query: List[List[ContextChunk]]) -> str:
+        """
+        Create one prompt that fact-checks several claims at once
+        
+        Each claim's context is capped as in create_fact_check_prompt, and chunks shared
+        between claims are listed only once.
+        
+        Args:
+            queries: Claims to fact-check
+            context_chunks_per_query: Retrieved context for each claim
+            
+        Returns:
+            Formatted prompt asking for one result per claim
+        """
+        unique_chunks, claim_sources = self._number_batch_sources(context_chunks_per_query)
+        return self._format_batch_prompt(queries, unique_chunks, claim_sources)
+    
+    def _number_batch_sources(self, context_chunks_per_query: List[List[ContextChunk]]
+                              ) -> Tuple[List[ContextChunk], List[Dict[int, int]]]:
+        """
+        Number each distinct selected chunk once across a batch, in first-seen order
+        
+        Args:
+            context_chunks_per_query: Retrieved context for each claim
+            
+        Returns:
+            The distinct chunks in prompt order, and for each claim a mapping from prompt
+            source number to the chunk's 1-based position in that claim's context
+        """
+        source_numbers = {}
+        unique_chunks = []
+        claim_sources = []
+        for context_chunks in context_chunks_per_query:
+            numbers = {}
+            for original_number, chunk in self._select_context(context_chunks):
+                text = chunk.text
+                if text not in source_numbers:
+                    unique_chunks.append(chunk)
+                    source_numbers[text] = len(unique_chunks)
+                numbers[source_numbers[text]] = original_number
+            claim_sources.append(numbers)
+        return unique_chunks, claim_sources
+    
+    @staticmethod
+    def _format_batch_prompt(queries: List[str], unique_chunks: List[ContextChunk], claim_sources: List[Dict[int, int]]) -> str:
+        """Lay out a batch prompt from the numbered sources of _number_batch_sources"""
+        parts = [BATCH_PROMPT_HEADER]
+        parts.extend(
+            f"\n[Source {i}] (File: {chunk.source_file})\n{chunk.text}\n"
+            for i, chunk in enumerate(unique_chunks, 1)
+        )
+        parts.append("\nCLAIMS:\n")
+        parts.extend(
+            f"\n[Claim {i}] \"{query}\" (Relevant sources: {', '.join(map(str, numbers))})\n"
+            for i, (query, numbers) in enumerate(zip(queries, claim_sources))
+        )
+        parts.append(BATCH_FACT_CHECK_FOOTER)
+        
+        return "".join(parts)
+    
+    def generate_batch_fact_check(self, queries: List[str],
+                                  context_chunks_per_query: List[List[ContextChunk]]) -> List[LLMResponseWrapper]:
+        """
+        Fact-check several claims, packing up to BATCH_CLAIMS_PER_REQUEST of them into each request
+        
+        Args:
+            queries: Claims to fact-check
+            context_chunks_per_query: Retrieved context for each claim
+            
+        Returns:
+            One LLMResponseWrapper per claim, in the same order
+        """
+        return run_sync(self.agenerate_batch_fact_check(queries, context_chunks_per_query))
+    
+    async def agenerate_batch_fact_check(self, queries: List[str],
+                                         context_chunks_per_query: List[List[ContextChunk]]) -> List[LLMResponseWrapper]:
+        """
+        Async version of generate_batch_fact_check, to be awaited on the shared event loop
+        
+        Args:
+            queries: Claims to fact-check
+            context_chunks_per_query: Retrieved context for each claim
+            
+        Returns:
+            One LLMResponseWrapper per claim, in the same order
+        """
+        if len(queries) != len(context_chunks_per_query):
+            raise ValueError("queries and context_chunks_per_query must have the same length")
+        context_chunks_per_query = [_as_context_chunks(context_chunks) for context_chunks in context_chunks_per_query]
+        
+        results: List[Optional[LLMResponseWrapper]] = [None] * len(queries)
+        cache_keys = {}
+        pending = []
+        
+        # Answer what we can without the API: empty context and cached claims
+        for i, (query, context_chunks) in enumerate(zip(queries, context_chunks_per_query)):
+            if not context_chunks:
+                results[i] = self._no_context_response()
+                continue
+            
+            cache_keys[i] = LLMCache.make_key(self.model, TEMPERATURE, query, context_chunks)
+            cached = self.cache.get(cache_keys[i])
+            if cached is not None:
+                results[i] = self._cached_response(cached)
+            else:
+                pending.append(i)
+        
+        groups = [pending[start:start + BATCH_CLAIMS_PER_REQUEST]
+                  for start in range(0, len(pending), BATCH_CLAIMS_PER_REQUEST)]
+        await asyncio.gather(*(
+            self._fact_check_group(group, queries, context_chunks_per_query, cache_keys, results)
+            for group in groups
+        ))
+        
+        return results
+    
+    @staticmethod
+    def _renumber_sources(claim_result: Dict[str, Any], source_map: Dict[int, int]) -> Dict[str, Any]:
+        """
+        Translate a claim's cited batch source numbers into positions in the claim's own context
+        
+        Citations of sources that were not listed for the claim are dropped.
+        
+        Args:
+            claim_result: One claim's entry from the batched response
+            source_map: Prompt source number to context position, from _number_batch_sources
+            
+        Returns:
+            The claim result with renumbered sources_used
+        """
+        sources = claim_result.get('sources_used')
+        if not isinstance(sources, list):
+            return claim_result
+        
+        renumbered = []
+        for source in sources:
+            number = source.get('source_number') if isinstance(source, dict) else None
+            if isinstance(number, int) and number in source_map:
+                renumbered.append({**source, 'source_number': source_map[number]})
+        return {**claim_result, 'sources_used': renumbered}
+    
+    async def _fact_check_group(self, group: List[int], queries: List[str], context_chunks_per_query: List[List[ContextChunk]],
+                                cache_keys: Dict[int, str], results: List[Optional[LLMResponseWrapper]]):
+        """Fact-check one group of claims in a single request and fill in their results"""
+        group_queries = [queries[i] for i in group]
+        group_contexts = [context_chunks_per_query[i] for i in group]
+        
+        try:
+            unique_chunks, claim_sources = self._number_batch_sources(group_contexts)
+            prompt = self._format_batch_prompt(group_queries, unique_chunks, claim_sources)
+            prompt_tokens = self.count_tokens(SYSTEM_MESSAGE) + self.count_tokens(prompt)
+            budget = min(sum(self.estimate_max_tokens(context) for context in group_contexts), BATCH_MAX_TOKENS)
+            
+            response = await self._create_completion(
+                messages=[
+                    {"role": "system", "content": SYSTEM_MESSAGE},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=self._fit_max_tokens(budget, prompt_tokens),
+                prompt_tokens=prompt_tokens,
+                response_format=self.batch_response_format
+            )
+        except Exception as e:
+            logger.error(f"Error generating batched LLM response: {e}")
+            for i in group:
+                results[i] = LLMResponseWrapper(
+                    status="error",
+                    fact_check=None,
+                    model_used=self.model,
+                    token_usage=TokenUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+                    error=str(e),
+                    fallback_response=self._create_fallback_response(context_chunks_per_query[i])
+                )
+            return
+        
+        generated_text = response.choices[0].message.content
+        
+        # Split the request's usage evenly across its claims
+        token_usage = TokenUsage(
+            prompt_tokens=response.usage.prompt_tokens // len(group),
+            completion_tokens=response.usage.completion_tokens // len(group),
+            total_tokens=response.usage.total_tokens // len(group)
+        )
+        
+        try:
+            # JSON mode doesn't enforce the schema, so "results" may be missing or not a list
+            results_data = orjson.loads(generated_text).get('results')
+            if not isinstance(results_data, list):
+                results_data = []
+            claim_results = {
+                item.get('claim_index'): item
+                for item in results_data
+                if isinstance(item, dict)
+            }
+        except (orjson.JSONDecodeError, AttributeError, TypeError) as parse_error:
+            logger.warning(f"Failed to parse batched LLM JSON response: {parse_error}")
+            claim_results = {}
+        
+        for position, i in enumerate(group):
+            try:
+                if position not in claim_results:
+                    raise ValueError(f"No result returned for claim {position}")
+                claim_result = self._renumber_sources(claim_results[position], claim_sources[position])
+                fact_check = self._parse_fact_check(claim_result, context_chunks_per_query[i])
+            except (ValidationError, ValueError) as parse_error:
+                results[i] = LLMResponseWrapper(
+                    status="error",
+                    fact_check=None,
+                    model_used=self.model,
+                    token_usage=token_usage,
+                    error=f"JSON parsing failed: {str(parse_error)}",
+                    fallback_response=generated_text
+                )
+                continue
+            
+            results[i] = LLMResponseWrapper(
+                status="success",
+                fact_check=fact_check,
+                model_used=self.model,
+                token_usage=token_usage
+            )
+            self.cache.set(cache_keys[i], results[i].model_dump(mode='json'))
+    
+    @retry(
+        retry=retry_if_exception(_is_retryable),
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(6),
+        reraise=True,
+    )
+    async def _create_completion(self, messages: List[Dict], max_tokens: int = MAX_TOKENS,
+                                 prompt_tokens: Optional[int] = None, **params):
+        """Create a chat completion within the rate limits, retrying residual 429s and transient errors"""
+        # The rate limiter counts the prompt plus the full completion budget
+        if prompt_tokens is None:
+            prompt_tokens = sum(self.count_tokens(message["content"]) for message in messages)
+        await self.rate_limiter.acquire(prompt_tokens + max_tokens)
+        
+        return await self.aclient.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            **params
+        )
+    
+    async def astream_fact_check(self, query: str, context_chunks: List[ContextChunk]) -> AsyncIterator[FactCheckResponse]:
+        """
+        Stream a fact-check, yielding partial results as each field of the JSON response completes
+        
+        The first yield usually carries only the classification, so a UI can show the verdict while
+        the analysis and reasoning are still generating. Partial results are built without validation
+        and only have the fields in their model_fields_set; the last yield is the full, validated response.
+        
+        Args:
+            query: User's fact-checking query
+            context_chunks: List of relevant document chunks with metadata including document_url
+            
+        Yields:
+            Partial FactCheckResponse objects, then the complete one
+            
+        Raises:
+            ValueError: If the completed response is not a valid fact-check
+        """
+        context_chunks = _as_context_chunks(context_chunks)
+        
+        if not context_chunks:
+            yield self._no_context_response().fact_check
+            return
+        
+        cache_key = LLMCache.make_key(self.model, TEMPERATURE, query, context_chunks)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield self._cached_response(cached).fact_check
+            return
+        
+        prompt = self.create_fact_check_prompt(query, context_chunks)
+        prompt_tokens = self.count_tokens(SYSTEM_MESSAGE) + self.count_tokens(prompt)
+        stream = await self._create_completion(
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=TEMPERATURE,
+            max_tokens=self._fit_max_tokens(self.estimate_max_tokens(context_chunks), prompt_tokens),
+            prompt_tokens=prompt_tokens,
+            response_format=self.response_format,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        parser = IncrementalJSONObjectParser()
+        fields = {}
+        usage = None
+        async for event in stream:
+            if event.usage is not None:
+                usage = event.usage
+            if not event.choices or not event.choices[0].delta.content:
+                continue
+            
+            completed = parser.feed(event.choices[0].delta.content)
+            if completed:
+                fields.update(completed)
+                if not parser.complete:
+                    if 'classification' in fields:
+                        try:
+                            fields['classification'] = FactCheckClassification(fields['classification'])
+                        except ValueError:
+                            pass
+                    yield FactCheckResponse.model_construct(**fields)
+        
+        fact_check = self._parse_fact_check(orjson.loads(parser.buffer), context_chunks)
+        if usage is not None:
+            wrapper = LLMResponseWrapper(
+                status="success",
+                fact_check=fact_check,
+                model_used=self.model,
+                token_usage=TokenUsage(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                    total_tokens=usage.total_tokens
+                )
+            )
+            self.cache.set(cache_key, wrapper.model_dump(mode='json'))
+        
+        yield fact_check
+    
+    async def generate_many(self, items: List[Tuple[str, List[ContextChunk]]],
+                            max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> List[LLMResponseWrapper]:
+        """
+        Fact-check several queries concurrently
+        
+        Sync callers can use run_sync(llm.generate_many(items)).
+        
+        Args:
+            items: (query, context_chunks) pairs
+            max_concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            One LLMResponseWrapper per item, in the same order
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded(query: str, context_chunks: List[ContextChunk]) -> LLMResponseWrapper:
+            async with sem:
+                return await self.agenerate_fact_check_response(query, context_chunks)
+        
+        # gather preserves task order, so responses line up with items
+        return await asyncio.gather(*(bounded(query, context_chunks) for query, context_chunks in items))
+    
+    def submit_batch(self, items: List[Tuple[str, List[ContextChunk]]]) -> str:
+        """
+        Submit fact-checks to the OpenAI Batch API (half price, results within 24 hours)
+        
+        Meant for bulk jobs that are not latency-critical, such as backfills and evaluation runs.
+        
+        Args:
+            items: (query, context_chunks) pairs
+            
+        Returns:
+            Batch ID to pass to wait_for_batch
+        """
+        items = [(query, _as_context_chunks(context_chunks)) for query, context_chunks in items]
+        
+        lines = []
+        for i, (query, context_chunks) in enumerate(items):
+            prompt = self.create_fact_check_prompt(query, context_chunks)
+            prompt_tokens = self.count_tokens(SYSTEM_MESSAGE) + self.count_tokens(prompt)
+            request = {
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_MESSAGE},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": TEMPERATURE,
+                    "max_tokens": self._fit_max_tokens(self.estimate_max_tokens(context_chunks), prompt_tokens),
+                    "response_format": self.response_format
+                }
+            }
+            lines.append(orjson.dumps(request))
+        
+        input_file = self.client.files.create(
+            file=("fact_checks.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        self._batch_items[batch.id] = list(items)
+        logger.info("Submitted batch %s with %d fact-checks", batch.id, len(items))
+        return batch.id
+    
+    def wait_for_batch(self, batch_id: str, items: Optional[List[Tuple[str, List[ContextChunk]]]] = None,
+                       poll_interval: float = BATCH_POLL_INTERVAL) -> List[LLMResponseWrapper]:
+        """
+        Wait for a Batch API job to finish and collect its fact-checks
+        
+        Args:
+            batch_id: Batch ID returned by submit_batch
+            items: The submitted (query, context_chunks) pairs; only needed if the batch was
+                submitted by another process, to attach document URLs and cache the results
+            poll_interval: Seconds between status checks
+            
+        Returns:
+            One LLMResponseWrapper per submitted item, in the same order
+            
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            logger.info("Batch %s is %s, checking again in %ss", batch_id, batch.status, poll_interval)
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch_id)
+        
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'")
+        
+        if items is not None:
+            items = [(query, _as_context_chunks(context_chunks)) for query, context_chunks in items]
+        else:
+            items = self._batch_items.pop(batch_id, None)
+        total = len(items) if items is not None else batch.request_counts.total
+        
+        # Successful requests are in the output file, failed ones in the error file
+        records = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        record = orjson.loads(line)
+                        records[int(record["custom_id"])] = record
+        
+        results = []
+        for i in range(total):
+            query, context_chunks = items[i] if items else (None, [])
+            record = records.get(i) or {}
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            
+            if response.get("status_code") != 200 or not body.get("choices"):
+                error = record.get("error") or body.get("error") or "No result returned for this request"
+                results.append(LLMResponseWrapper(
+                    status="error",
+                    fact_check=None,
+                    model_used=self.model,
+                    token_usage=TokenUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+                    error=str(error),
+                    fallback_response=self._create_fallback_response(context_chunks)
+                ))
+                continue
+            
+            generated_text = body["choices"][0]["message"]["content"]
+            token_usage = TokenUsage(**{key: body["usage"][key] for key in TokenUsage.model_fields})
+            
+            try:
+                fact_check = self._parse_fact_check(orjson.loads(generated_text), context_chunks)
+            except (orjson.JSONDecodeError, ValidationError, ValueError) as parse_error:
+                results.append(LLMResponseWrapper(
+                    status="error",
+                    fact_check=None,
+                    model_used=self.model,
+                    token_usage=token_usage,
+                    error=f"JSON parsing failed: {str(parse_error)}",
+                    fallback_response=generated_text
+                ))
+                continue
+            
+            wrapper = LLMResponseWrapper(
+                status="success",
+                fact_check=fact_check,
+                model_used=self.model,
+                token_usage=token_usage
+            )
+            if query is not None:
+                self.cache.set(LLMCache.make_key(self.model, TEMPERATURE, query, context_chunks),
+                               wrapper.model_dump(mode='json'))
+            results.append(wrapper)
+        
+        return results
+    
+    def _create_fallback_response(self, context_chunks: List[ContextChunk]) -> str:
         """
         Create a fallback response when LLM fails
         
@@ -213,16 +1455,19 @@ You must respond with a JSON object matching this exact structure:
         if not context_chunks:
             return "No relevant context found to fact-check this query."
         
-        response = "LLM service unavailable. Here are the most relevant sources found:\n\n"
+        parts = ["LLM service unavailable. Here are the most relevant sources found:\n\n"]
         
         for i, chunk in enumerate(context_chunks[:3], 1):  # Show top 3 chunks
-            confidence = chunk.get('confidence', 0)
-            source = chunk.get('source_file', 'unknown')
-            text = chunk.get('text', '')[:200] + "..." if len(chunk.get('text', '')) > 200 else chunk.get('text', '')
+            text = chunk.text
+            if len(text) > 200:
+                text = text[:200] + "..."
             
-            response += f"Source {i} (Confidence: {confidence:.3f})\nFrom: {source}\n{text}\n\n"
+            parts.append(
+                f"Source {i} (Confidence: {chunk.confidence:.3f})\n"
+                f"From: {chunk.source_file}\n{text}\n\n"
+            )
         
-        return response
+        return "".join(parts)
     
     def test_connection(self) -> Dict:
         """
@@ -264,36 +1509,51 @@ def test_llm_service():
         # Test fact-checking with sample data
         sample_query = "Is the Earth round?"
         sample_context = [
-            {
-                "text": "The Earth is approximately spherical in shape, with a slight flattening at the poles due to its rotation.",
-                "confidence": 0.95,
-                "source_file": "science_facts.txt"
-            },
-            {
-                "text": "Satellite imagery and space missions have confirmed the Earth's spherical shape.",
-                "confidence": 0.92,
-                "source_file": "space_exploration.txt"
-            }
+            ContextChunk(
+                text="The Earth is approximately spherical in shape, with a slight flattening at the poles due to its rotation.",
+                source_file="science_facts.txt",
+                chunk_index=0,
+                confidence=0.95,
+                distance=0.05
+            ),
+            ContextChunk(
+                text="Satellite imagery and space missions have confirmed the Earth's spherical shape.",
+                source_file="space_exploration.txt",
+                chunk_index=0,
+                confidence=0.92,
+                distance=0.08
+            )
         ]
         
         print(f"\nTesting fact-check for: '{sample_query}'")
         result = llm.generate_fact_check_response(sample_query, sample_context)
         
-        if result["status"] == "success":
+        if result.status == "success":
             print("Fact-check response generated successfully")
             print("\nResponse:")
-            print(result["response"])
-            print(f"\nToken usage: {result['token_usage']}")
+            print(result.fact_check.model_dump_json(indent=2))
+            print(f"\nToken usage: {result.token_usage}")
         else:
             print("ERROR: Fact-check failed:")
-            print(result.get("error", "Unknown error"))
-            if "fallback_response" in result:
+            print(result.error or "Unknown error")
+            if result.fallback_response:
                 print("\nFallback response:")
-                print(result["fallback_response"])
+                print(result.fallback_response)
         
     except Exception as e:
         print(f"ERROR: Test failed: {e}")
 
 
 if __name__ == "__main__":
-    test_llm_service()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="LLM service for fact-checking responses")
+    parser.add_argument("--test", action="store_true",
+                       help="Run a live connection and fact-check test against the OpenAI API")
+    
+    args = parser.parse_args()
+    
+    if args.test:
+        test_llm_service()
+    else:
+        parser.print_help()
\ No newline at end of file
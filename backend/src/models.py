@@ -2,7 +2,7 @@
 Pydantic models for structured LLM responses and API data
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from enum import Enum
 
@@ -19,6 +19,8 @@ class FactCheckClassification(str, Enum):
 
 class SourceReference(BaseModel):
     """Reference to a source document used in fact-checking"""
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     source_number: int = Field(description="Source number from the context")
     file_name: str = Field(description="Name of the source file")
     document_url: Optional[str] = Field(default=None, description="URL or path to access the source document")
@@ -26,6 +28,8 @@ class SourceReference(BaseModel):
 
 class FactCheckResponse(BaseModel):
     """Structured fact-checking response from LLM"""
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     classification: FactCheckClassification = Field(description="Fact-check classification")
     analysis: str = Field(description="Detailed analysis of the claim", min_length=10)
     sources_used: List[SourceReference] = Field(description="Sources that support the conclusion")
@@ -40,7 +44,9 @@ class TokenUsage(BaseModel):
 
 
 class ContextChunk(BaseModel):
-    """Context chunk with metadata"""
+    """Context chunk with metadata (immutable and hashable once validated)"""
+    model_config = ConfigDict(frozen=True)
+
     text: str = Field(description="Text content of the chunk")
     source_file: str = Field(description="Source file name")
     source: Optional[str] = Field(default=None, description="Original source URL of the document")
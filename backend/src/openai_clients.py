@@ -0,0 +1,87 @@
+"""
+Shared HTTP connection pools for OpenAI clients
+Every DocumentProcessor and LLMService reuses the same keep-alive connections instead of opening its own
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# HTTP/2 multiplexes concurrent embedding batches and fact-checks over a few TLS connections
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+# Fail fast on unreachable hosts, but allow long completions
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# OpenAI clients kept per API key (least recently used are dropped first)
+CLIENT_CACHE_SIZE = 32
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_openai_clients: "OrderedDict[str, OpenAI]" = OrderedDict()
+_async_openai_clients: "OrderedDict[str, AsyncOpenAI]" = OrderedDict()
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+
+
+def _ensure_http_clients():
+    """Create the shared HTTP clients on first use, and again after a fork (e.g. in gunicorn workers)"""
+    global _http_client, _async_http_client, _clients_pid
+
+    if _clients_pid == os.getpid():
+        return
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            _async_http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            _openai_clients.clear()
+            _async_openai_clients.clear()
+            _clients_pid = os.getpid()
+
+
+def _get_cached_client(clients: OrderedDict, api_key: str, factory):
+    """Return the client cached for an API key, creating it with factory() on first use"""
+    with _clients_lock:
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = factory()
+        clients.move_to_end(api_key)
+        while len(clients) > CLIENT_CACHE_SIZE:
+            clients.popitem(last=False)
+        return client
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """
+    Get the OpenAI client for an API key, backed by the shared connection pool
+
+    Args:
+        api_key: OpenAI API key
+
+    Returns:
+        OpenAI client
+    """
+    _ensure_http_clients()
+    return _get_cached_client(_openai_clients, api_key, lambda: OpenAI(api_key=api_key, http_client=_http_client))
+
+
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Get the AsyncOpenAI client for an API key, backed by the shared async connection pool
+
+    The async pool binds to the event loop it is first used on, so these clients should
+    only be awaited on the shared loop from async_utils.
+
+    Args:
+        api_key: OpenAI API key
+
+    Returns:
+        AsyncOpenAI client
+    """
+    _ensure_http_clients()
+    return _get_cached_client(
+        _async_openai_clients, api_key, lambda: AsyncOpenAI(api_key=api_key, http_client=_async_http_client)
+    )